@@ -7,12 +7,16 @@ Période : 2016–2025
 Polluants : PM2.5, PM10, CO, NO2, SO2, O3.
 """
 
-from dash import Dash, dcc, ctx, html, Input, Output, State
+from dash import Dash, dcc, ctx, html, Input, Output, State, ALL, Patch
 from src.components.footer import create_footer
 from src.components.navbar import create_navbar
 from src.components.graphique_vie_pays import create_life_expectancy_graph, create_life_expectancy_section
 from src.components.histo_annee_perdue import create_years_lost_histogram, create_years_lost_histogram_section
-import geopandas as gpd
+from src.utils.data_loader import load_measurements
+import json
+import os
+import threading
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 import pycountry
@@ -27,76 +31,114 @@ cache = Cache(app.server, config={
     'CACHE_DEFAULT_TIMEOUT': 300  # 5 minutes
 })
 
-@cache.memoize(timeout=3600) 
-def load_geojson_data():
-    """
-    Charge les données GeoJSON depuis le fichier source et les met en cache.
-    Dérive les colonnes year, lat et lon depuis les métadonnées existantes.
-    Mise en cache pendant 1h.
-
-    :returns geopandas.GeoDataFrame: DataFrame enrichi avec les colonnes year, lat et lon
-    """
-    data = gpd.read_file("data/cleaned/cleaneddata.geojson")
-    data['measurements_lastupdated'] = pd.to_datetime(data['measurements_lastupdated'])
-    data['year'] = data['measurements_lastupdated'].dt.year
-    data['lat'] = data.geometry.y
-    data['lon'] = data.geometry.x
-    return data
+# Données chargées une seule fois à l'import, partagées en lecture seule par les callbacks
+_DATA = load_measurements()
 
-@lru_cache(maxsize=128)
-def iso2_to_iso3(iso2_code):
-    """
-    Convertit un code pays ISO 3166-1 alpha-2 en alpha-3.
-    Le résultat est mis en cache.
-
-    :param iso2_code str: Code pays sur deux lettres (ex. 'FR', 'US')
-    :returns str Code pays sur trois lettres (ex. 'FRA'), ou None si non reconnu
-    """
-    try:
-        return pycountry.countries.get(alpha_2=iso2_code).alpha_3
-    except:
-        return None
-
-@cache.memoize(timeout=3600)
-def get_all_countries_df():
-    """
-    Génère un DataFrame contenant tous les pays du monde selon pycountry.
-    Mise en cache pendant 1h.
+# Correspondance ISO 3166-1 alpha-2 -> alpha-3 et liste ordonnée de tous les pays, construites une seule fois
+ISO2_TO_ISO3 = {country.alpha_2: country.alpha_3 for country in pycountry.countries}
+ISO3_LIST = [country.alpha_3 for country in pycountry.countries]
+ISO3_POS = {iso3: i for i, iso3 in enumerate(ISO3_LIST)}
 
-    :returns pandas.DataFrame: DataFrame avec les colonnes country_iso3 (alpha-3) et country_name (nom officiel)
-    """
-    all_countries = []
-    for country in pycountry.countries:
-        all_countries.append({
-            'country_iso3': country.alpha_3,
-            'country_name': country.name
-        })
-    return pd.DataFrame(all_countries)
+# Positions des lignes de _DATA pour chaque couple (année, polluant), calculées une seule fois :
+# un filtre devient une concaténation de quelques tableaux d'indices au lieu d'un parcours complet
+ROWS_BY_YEAR_POLLUTANT = _DATA.groupby(['year', 'measurements_parameter'], observed=True).indices
 
-@cache.memoize(timeout=600)
+@lru_cache(maxsize=32)
 def get_filtered_data(year, pollutants_tuple):
     """
     Filtre les données de pollution par année et, optionnellement, par polluants.
     Le type tuple (immuable) est requis pour pollutants_tuple pour permettre la mise en cache.
-    Mise en cache pendant 10min.
+    Mise en cache en mémoire sans copie : update_map et create_map partagent le même sous-ensemble
+    pour une sélection donnée, qui ne doit donc pas être modifié.
 
     :param year int: Année de mesure souhaitée (ex. 2020)
     :param pollutants_tuple tuple Tuple trié des polluants à retenir (ex. ('NO2', 'PM2.5')), ou None pour aucun filtre
-    :returns geopandas.GeoDataFrame: Sous-ensemble des données filtré selon les critères fournis
+    :returns pandas.DataFrame: Sous-ensemble des données filtré selon les critères fournis
     """
-    data = load_geojson_data()
-    data_filtered = data[data['year'] == year].copy()
+    pollutants = pollutants_tuple or _DATA['measurements_parameter'].cat.categories
+    rows = [ROWS_BY_YEAR_POLLUTANT[(year, p)] for p in pollutants if (year, p) in ROWS_BY_YEAR_POLLUTANT]
     
-    if pollutants_tuple:
-        pollutants_list = list(pollutants_tuple)
-        data_filtered = data_filtered[data_filtered['measurements_parameter'].isin(pollutants_list)]
+    # Tri des positions pour conserver l'ordre d'origine des lignes
+    rows = np.sort(np.concatenate(rows)) if rows else np.empty(0, dtype=np.int64)
+    return _DATA.iloc[rows]
+
+def sum_by_code(codes, values, n_groups):
+    """
+    Calcule la somme et l'effectif de values par groupe, les groupes étant désignés par des codes entiers
+    (ex. codes d'une colonne catégorielle). Deux passes np.bincount, sans le coût fixe d'un groupby pandas.
+    Les codes négatifs (valeurs manquantes) sont ignorés.
+
+    :param codes numpy.ndarray: Code de groupe de chaque ligne (entre 0 et n_groups - 1, ou -1)
+    :param values numpy.ndarray: Valeur de chaque ligne
+    :param n_groups int: Nombre total de groupes
+    :returns tuple: (sommes, effectifs), deux tableaux de longueur n_groups
+    """
+    valid = codes >= 0
+    codes = codes[valid]
+    counts = np.bincount(codes, minlength=n_groups)
+    sums = np.bincount(codes, weights=values[valid], minlength=n_groups)
+    return sums, counts
+
+def build_country_cube(data):
+    """
+    Pré-calcule, pour chaque triplet (année, polluant, pays), la somme et le nombre des mesures,
+    la position de la première mesure et la date de la plus récente.
+    La moyenne d'un pays pour n'importe quelle sélection de polluants s'obtient ensuite en sommant
+    quelques tranches du cube, sans repasser sur les mesures.
+
+    :param data pandas.DataFrame: Mesures avec les colonnes year, measurements_parameter et country (catégorielles)
+    :returns tuple: (années, sommes, effectifs, premières lignes, dernières dates), les quatre derniers de forme
+        (années, polluants, pays) ; les dates sont en nanosecondes depuis 1970 (minimum int64 si aucune mesure)
+    """
+    years = np.arange(data['year'].min(), data['year'].max() + 1)
+    n_pollutants = len(data['measurements_parameter'].cat.categories)
+    n_countries = len(data['country'].cat.categories)
+    shape = (len(years), n_pollutants, n_countries)
+    
+    pollutant_codes = data['measurements_parameter'].cat.codes.to_numpy()
+    country_codes = data['country'].cat.codes.to_numpy()
+    codes = ((data['year'].to_numpy() - years[0]) * n_pollutants + pollutant_codes) * n_countries + country_codes
+    codes[(pollutant_codes < 0) | (country_codes < 0)] = -1
+    
+    sums, counts = sum_by_code(codes, data['measurements_value'].to_numpy(), np.prod(shape))
+    
+    valid = codes >= 0
+    first_rows = np.full(np.prod(shape), len(data), dtype=np.int64)
+    np.minimum.at(first_rows, codes[valid], np.flatnonzero(valid))
+    last_dates = np.full(np.prod(shape), np.iinfo(np.int64).min, dtype=np.int64)
+    dates = data['measurements_lastupdated'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+    np.maximum.at(last_dates, codes[valid], dates[valid])
+    
+    return years, sums.reshape(shape), counts.reshape(shape), first_rows.reshape(shape), last_dates.reshape(shape)
+
+# Agrégats par (année, polluant, pays), calculés une seule fois au démarrage
+CUBE_YEARS, COUNTRY_SUMS, COUNTRY_COUNTS, COUNTRY_FIRST_ROWS, COUNTRY_LAST_DATES = build_country_cube(_DATA)
+# Code ISO-3 et nom anglais de chaque pays du cube (NaN si inconnu)
+COUNTRY_ISO3 = _DATA['country'].cat.categories.map(ISO2_TO_ISO3)
+COUNTRY_NAMES = _DATA.groupby('country', observed=False)['country_name_en'].first().astype(object).to_numpy()
+
+def get_cube_cells(cube, year, pollutants_tuple):
+    """
+    Extrait d'un cube (années, polluants, pays) les tranches d'une année et des polluants demandés.
+
+    :param cube numpy.ndarray: Cube construit par build_country_cube
+    :param year int: Année de mesure souhaitée
+    :param pollutants_tuple tuple Tuple trié des polluants à considérer, ou None pour tous
+    :returns numpy.ndarray: Tableau (polluants sélectionnés, pays), sans aucune ligne si l'année n'est pas couverte
+    """
+    if not CUBE_YEARS[0] <= year <= CUBE_YEARS[-1]:
+        return cube[0, :0]
     
-    return data_filtered
+    selected = _DATA['measurements_parameter'].cat.categories.isin(pollutants_tuple) if pollutants_tuple else slice(None)
+    return cube[year - CUBE_YEARS[0], selected]
 
 @cache.memoize(timeout=600)
 def calculate_country_pollution(year, pollutants_tuple):
     """
     Calcule la pollution moyenne par pays pour une année et des polluants donnés.
+    Les moyennes sont calculées par un groupby sur les mesures filtrées et non à partir des sommes du cube,
+    faites polluant par polluant : une moyenne tombant à mi-chemin de deux centièmes s'afficherait sinon
+    arrondie autrement sur la carte que dans le classement.
     Les pays dont le code ISO-2 ne peut pas être converti en ISO-3 sont supprimés.
     Mise en cache pendant 10min.
 
@@ -104,71 +146,260 @@ def calculate_country_pollution(year, pollutants_tuple):
     :param pollutants_tuple tuple  Tuple trié des polluants à considérer, ou None pour tous
     :returns pandas.DataFrame: DataFrame avec les colonnes country (ISO-2), avg_pollution (moyenne en µg/m³) et country_iso3 (ISO-3)
     """
+    countries = _DATA['country'].cat.categories
+    counts = get_cube_cells(COUNTRY_COUNTS, year, pollutants_tuple).sum(axis=0)
+    # Une ligne par catégorie de pays (observed=False), dans l'ordre de countries
+    means = get_filtered_data(year, pollutants_tuple).groupby('country', observed=False)['measurements_value'].mean().to_numpy()
+    
+    kept = (counts > 0) & COUNTRY_ISO3.notna()
+    pollution_by_country = pd.DataFrame({
+        'country': countries[kept],
+        'avg_pollution': means[kept],
+        'country_iso3': COUNTRY_ISO3[kept]
+    })
+    
+    return pollution_by_country
+
+def rank_countries(year, pollutants_tuple, n=5):
+    """
+    Classe les pays les plus pollués pour une année et des polluants donnés. Le cube pré-calculé choisit
+    les n premiers pays ; leurs moyennes affichées sont ensuite recalculées sur leurs seules mesures.
+    Les pays sans nom anglais ne sont pas classés.
+
+    :param year int: Année de mesure souhaitée
+    :param pollutants_tuple tuple Tuple trié des polluants à considérer, ou None pour tous
+    :param n int: Nombre de pays à retenir
+    :returns pandas.DataFrame: n lignes triées par pollution décroissante, avec les colonnes country, country_name_en,
+        measurements_value (moyenne), measurements_unit (unité de la première mesure) et measurements_lastupdated (plus récente)
+    """
+    countries = _DATA['country'].cat.categories
+    sums = get_cube_cells(COUNTRY_SUMS, year, pollutants_tuple).sum(axis=0)
+    counts = get_cube_cells(COUNTRY_COUNTS, year, pollutants_tuple).sum(axis=0)
+    
+    ranked = np.flatnonzero((counts > 0) & pd.notna(COUNTRY_NAMES))
+    means = sums[ranked] / counts[ranked]
+    order = np.argsort(-means, kind='stable')[:n]
+    ranked = ranked[order]
+    
+    # Les sommes du cube sont faites polluant par polluant : au dernier bit près, une moyenne tombant
+    # à mi-chemin de deux centièmes s'afficherait arrondie autrement. Les moyennes des n pays retenus
+    # sont donc recalculées sur leurs mesures, comme le ferait un groupby sur les données filtrées.
     data = get_filtered_data(year, pollutants_tuple)
+    data = data[data['country'].isin(countries[ranked])]
+    means = data.groupby('country', observed=True)['measurements_value'].mean().reindex(countries[ranked]).to_numpy()
     
-    pollution_by_country = data.groupby('country')['measurements_value'].mean().reset_index()
-    pollution_by_country.columns = ['country', 'avg_pollution']
-    pollution_by_country['country_iso3'] = pollution_by_country['country'].apply(iso2_to_iso3)
-    pollution_by_country = pollution_by_country.dropna(subset=['country_iso3'])
+    first_rows = get_cube_cells(COUNTRY_FIRST_ROWS, year, pollutants_tuple).min(axis=0, initial=len(_DATA))[ranked]
+    last_dates = get_cube_cells(COUNTRY_LAST_DATES, year, pollutants_tuple).max(axis=0, initial=np.iinfo(np.int64).min)[ranked]
     
-    return pollution_by_country
+    return pd.DataFrame({
+        'country': countries[ranked],
+        'country_name_en': COUNTRY_NAMES[ranked],
+        'measurements_value': means,
+        'measurements_unit': _DATA['measurements_unit'].to_numpy()[first_rows],
+        'measurements_lastupdated': pd.to_datetime(last_dates.view('datetime64[ns]'), utc=True)
+    })
+
+@cache.memoize(timeout=3600)
+def get_ranking_rows(year, pollutants_tuple):
+    """
+    Prépare les lignes du tableau de classement Top 5, déjà mises en forme pour l'affichage.
+    Mise en cache pendant 1h : il n'existe que quelques centaines de combinaisons (année, polluants).
+
+    :param year int: Année de mesure souhaitée
+    :param pollutants_tuple tuple Tuple trié des polluants à considérer, ou None pour tous
+    :returns list: Jusqu'à 5 tuples (rang, pays, unité, valeur moyenne, date de dernière mesure), tous en str
+    """
+    top_countries = rank_countries(year, pollutants_tuple, n=5)
+    
+    # Mise en forme colonne par colonne plutôt que ligne par ligne (iterrows)
+    country_names = top_countries['country_name_en'].fillna(top_countries['country'])
+    units = top_countries['measurements_unit'].fillna('µg/m³')
+    values = top_countries['measurements_value'].map('{:.2f}'.format)
+    dates = top_countries['measurements_lastupdated'].dt.strftime('%d/%m/%Y')
+    
+    table_rows = [
+        (f"#{rank}", country_name, unit, value, date)
+        for rank, (country_name, unit, value, date) in enumerate(zip(country_names, units, values, dates), start=1)
+    ]
+    
+    return table_rows
 
+@lru_cache(maxsize=128)
+def get_world_pollution(year, pollutants_tuple):
+    """
+    Range la pollution moyenne par pays dans l'ordre de ISO3_LIST (0 si aucune mesure),
+    prête à être passée comme z au go.Choropleth avec locations=ISO3_LIST.
+    Mise en cache en mémoire : l'animation ne parcourt que 10 années, les rejeux sont donc gratuits.
+    Le tableau retourné est partagé, il est donc en lecture seule.
 
-def get_color_by_pollutant(pollutant):
+    :param year int: Année de mesure souhaitée
+    :param pollutants_tuple tuple Tuple trié des polluants à considérer, ou None pour tous
+    :returns numpy.ndarray: Pollution moyenne de chaque pays de ISO3_LIST
     """
-    Retourne la couleur hexadécimale associée à un polluant.
+    pollution_by_country = calculate_country_pollution(year, pollutants_tuple)
+    
+    z = np.zeros(len(ISO3_LIST))
+    positions = pollution_by_country['country_iso3'].map(ISO3_POS).to_numpy(dtype=np.int64)
+    z[positions] = pollution_by_country['avg_pollution'].to_numpy()
+    z.flags.writeable = False
+    
+    return z
 
-    :param pollutant str: Nom du polluant (ex. 'PM2.5', 'O3')
-    :returns str: Code couleur hexadécimal (ex. '#EF4444'), ou '#6B7280' (gris) si polluant inconnu
-    """
-    colors = {
-        'PM2.5': '#EF4444',
-        'PM10': '#F97316',
-        'CO': '#A855F7',
-        'NO2': '#3B82F6',
-        'SO2': '#10B981',
-        'O3': '#06B6D4'
-    }
-    return colors.get(pollutant, '#6B7280')
 
+POLLUTANT_COLORS = {
+    'PM2.5': '#EF4444',
+    'PM10': '#F97316',
+    'CO': '#A855F7',
+    'NO2': '#3B82F6',
+    'SO2': '#10B981',
+    'O3': '#06B6D4'
+}
+DEFAULT_POLLUTANT_COLOR = '#6B7280'
+
+# Échelle de couleurs discrète indexée par code de polluant (dernier code = polluant inconnu) :
+# un tableau numérique est validé bien plus vite par Plotly qu'un tableau de chaînes de couleurs
+POLLUTANT_ORDER = list(POLLUTANT_COLORS)
+POLLUTANT_COLORSCALE = [
+    [i / len(POLLUTANT_ORDER), color]
+    for i, color in enumerate(list(POLLUTANT_COLORS.values()) + [DEFAULT_POLLUTANT_COLOR])
+]
 
-def get_pollution_level(pollutant, value):
+
+def create_pollutant_button(pollutant):
     """
-    Détermine le niveau qualitatif de pollution selon les seuils recommandés.
-    Classifie la valeur en quatre niveaux : Bon, Moyen, Mauvais ou Très mauvais.
+    Crée un bouton de sélection de polluant, identifié par un id à motif
+    pour être géré par un seul callback quel que soit le nombre de boutons.
 
-    :param pollutant str: Nom du polluant (ex. 'PM2.5', 'NO2')
-    :param value float: Valeur mesurée dans l'unité associée au polluant
-    :returns str: Niveau 'Bon', 'Moyen', 'Mauvais', 'Très mauvais', ou 'Inconnu' si le polluant n'est pas référencé
+    :param pollutant str: Nom du polluant (ex. 'PM2.5', 'O3')
+    :returns dash.html.Button: Bouton du polluant
     """
-    thresholds = {
-        'PM2.5': [15, 35, 55],
-        'PM10': [50, 100, 150],
-        'NO2': [40, 100, 200],
-        'SO2': [20, 80, 250],
-        'O3': [100, 160, 240],
-        'CO': [4000, 10000, 20000]
-    }
+    css_key = pollutant.lower().replace('.', '')
+    return html.Button(pollutant, id={'type': 'poll-btn', 'name': pollutant}, n_clicks=0, className=f'btn-{css_key}')
+
+
+# Seuils (bornes supérieures incluses) des niveaux Bon, Moyen et Mauvais pour chaque polluant
+POLLUTION_THRESHOLDS = {
+    'PM2.5': np.array([15, 35, 55]),
+    'PM10': np.array([50, 100, 150]),
+    'NO2': np.array([40, 100, 200]),
+    'SO2': np.array([20, 80, 250]),
+    'O3': np.array([100, 160, 240]),
+    'CO': np.array([4000, 10000, 20000])
+}
+POLLUTION_LEVELS = np.array(['Bon', 'Moyen', 'Mauvais', 'Très mauvais'], dtype=object)
+
+
+def get_pollution_levels(pollutants, values):
+    """
+    Détermine le niveau qualitatif de pollution de chaque mesure selon les seuils recommandés
+    (Bon, Moyen, Mauvais ou Très mauvais), en classant toutes les mesures d'un coup avec
+    np.searchsorted sur les seuils de chaque polluant, au lieu d'un appel Python par ligne.
+    Les lignes sont regroupées par polluant en une seule passe (positions de chaque groupe).
+
+    :param pollutants pandas.Series: Nom du polluant de chaque mesure
+    :param values pandas.Series: Valeur de chaque mesure
+    :returns numpy.ndarray: Niveau de chaque mesure ('Bon', ..., 'Très mauvais', ou 'Inconnu')
+    """
+    pollutants = pd.Series(pollutants).reset_index(drop=True)
+    values = np.asarray(values)
+    levels = np.full(len(values), "Inconnu", dtype=object)
     
-    if pollutant not in thresholds:
-        return "Inconnu"
+    for pollutant, rows in pollutants.groupby(pollutants, observed=True, sort=False).indices.items():
+        thresholds = POLLUTION_THRESHOLDS.get(pollutant)
+        if thresholds is not None:
+            levels[rows] = POLLUTION_LEVELS[np.searchsorted(thresholds, values[rows])]
     
-    levels = thresholds[pollutant]
-    if value <= levels[0]:
-        return "Bon"
-    elif value <= levels[1]:
-        return "Moyen"
-    elif value <= levels[2]:
-        return "Mauvais"
-    else:
-        return "Très mauvais"
+    return levels
+
+
+# Nombre maximal de marqueurs envoyés au navigateur et pas de grille (en degrés) essayés pour y parvenir
+MAX_MAP_POINTS = 5000
+GRID_STEPS = (0.1, 0.25, 0.5, 1.0)
+# Taille des marqueurs (px) : proportionnelle à la racine du nombre de mesures regroupées, bornée
+MARKER_SIZE_MIN = 6
+MARKER_SIZE_MAX = 16
+
+
+def aggregate_points(data, max_points=MAX_MAP_POINTS):
+    """
+    Regroupe les stations proches qui se superposeraient à l'écran : les mesures d'un même polluant
+    (et d'une même unité) tombant dans la même case d'une grille lat/lon sont fusionnées en un point
+    à leur position et valeur moyennes. Le pas retenu est le plus fin de GRID_STEPS qui donne
+    au plus max_points points, ce qui allège la figure envoyée au navigateur.
+
+    :param data pandas.DataFrame: Mesures filtrées (colonnes lat, lon, measurements_parameter, measurements_value...)
+    :param max_points int: Nombre maximal de points souhaité
+    :returns pandas.DataFrame: Un point par case et par polluant, avec le nombre de mesures regroupées dans count
+    """
+    for step in GRID_STEPS:
+        groups = data.groupby([
+            data['measurements_parameter'],
+            data['measurements_unit'],
+            (data['lat'] // step).rename('lat_bin'),
+            (data['lon'] // step).rename('lon_bin')
+        ], sort=False, dropna=False, observed=True)
+        if groups.ngroups <= max_points:
+            break
+    
+    points = groups.agg(
+        lat=('lat', 'mean'),
+        lon=('lon', 'mean'),
+        measurements_value=('measurements_value', 'mean'),
+        location=('location', 'first'),
+        country=('country', 'first'),
+        country_name_en=('country_name_en', 'first'),
+        count=('measurements_value', 'size')
+    ).reset_index(level=['measurements_parameter', 'measurements_unit']).reset_index(drop=True)
+    
+    # Les valeurs isolées restent telles que mesurées, les moyennes sont arrondies pour l'affichage
+    points['measurements_value'] = points['measurements_value'].where(points['count'] == 1, points['measurements_value'].round(2))
+    
+    return points
+
+
+# Échelle de couleurs de la chloroplèthe (0 = pays sans mesure)
+CHOROPLETH_COLORSCALE = [
+    [0.0, "#EFEFFE"],
+    [0.00001, "#C3E1F6"],
+    [0.1, "#9DCCF3"],
+    [0.2, "#78BEF8"],
+    [0.3, "#45A4F2"],
+    [0.4, "#2297F6"],
+    [0.5, "#0A83E5"],
+    [0.6, "#0D72CA"],
+    [0.7, "#0E5EAE"],
+    [0.8, "#0D4C94"],
+    [1.0, "#093981"],
+]
+
+# Habillage statique de la carte (projection, frontières, marges), validé une seule fois par Plotly
+MAP_FIGURE_TEMPLATE = go.Figure()
+MAP_FIGURE_TEMPLATE.update_geos(
+    projection_type="natural earth",
+    visible=False,
+    showcountries=True,
+    showcoastlines=True,
+    coastlinecolor="#666666",
+    countrycolor="#333333",
+    countrywidth=0.5,
+    showland=False
+)
+
+MAP_FIGURE_TEMPLATE.update_layout(
+    margin=dict(l=0, r=0, t=0, b=0),
+    height=600,
+    showlegend=False,
+    # Conserve le zoom et le déplacement de l'utilisateur quand la carte est mise à jour
+    uirevision='carte',
+    geo=dict(
+        bgcolor='rgba(255,255,255,0)'
+    )
+)
 
 
-@cache.memoize(timeout=600)
 def create_map(year, pollutants_tuple):
     """
     Construit la carte chloroplète Plotly.
-    Mise en cache pendant 10min.
 
     :param year int: Année pour laquelle les données sont affichées
     :param pollutants_tuple tuple Tuple trié des polluants sélectionnés, ou None si aucun filtre
@@ -178,40 +409,19 @@ def create_map(year, pollutants_tuple):
     # Récupérer les données depuis le cache
     data = get_filtered_data(year, pollutants_tuple)
     pollution_by_country = calculate_country_pollution(year, pollutants_tuple)
-    all_countries_df = get_all_countries_df()
-    
-    world_pollution = all_countries_df.merge(
-        pollution_by_country[['country_iso3', 'avg_pollution']], 
-        on='country_iso3', 
-        how='left'
-    )
-    
-    world_pollution['avg_pollution'] = world_pollution['avg_pollution'].fillna(0)
-    
-    colorscale = [
-        [0.0, "#EFEFFE"],
-        [0.00001, "#C3E1F6"],
-        [0.1, "#9DCCF3"],
-        [0.2, "#78BEF8"],
-        [0.3, "#45A4F2"],
-        [0.4, "#2297F6"],
-        [0.5, "#0A83E5"],
-        [0.6, "#0D72CA"],
-        [0.7, "#0E5EAE"],
-        [0.8, "#0D4C94"],
-        [1.0, "#093981"],
-    ]
+    world_pollution = get_world_pollution(year, pollutants_tuple)
     
     zmin = pollution_by_country["avg_pollution"].min()
     zmax = pollution_by_country["avg_pollution"].max()
     
-    fig = go.Figure()
+    fig = go.Figure(MAP_FIGURE_TEMPLATE)
     
     fig.add_trace(go.Choropleth(
-        locations=world_pollution['country_iso3'],
-        z=world_pollution['avg_pollution'],
+        locations=ISO3_LIST,
+        # float64, transmis en tableau typé base64 : le survol affiche au centième la même moyenne que le classement
+        z=world_pollution,
         locationmode='ISO-3',
-        colorscale=colorscale,
+        colorscale=CHOROPLETH_COLORSCALE,
         zmin=zmin,
         zmax=zmax,
         marker_line_color='#333333',
@@ -221,63 +431,93 @@ def create_map(year, pollutants_tuple):
         showlegend=False
     ))
     
-    data['level'] = data.apply(lambda row: get_pollution_level(row['measurements_parameter'], row['measurements_value']), axis=1)
-    data['hover_text'] = data.apply(lambda row: 
-        f"<b>{row.get('location', 'Localisation inconnue')}</b><br>" +
-        f"Pays: {row.get('country_name_en', row.get('country', 'N/A'))}<br>" +
-        f"Polluant: {row['measurements_parameter']}<br>" +
-        f"Valeur: {row['measurements_value']} {row.get('measurements_unit', '')}<br>" +
-        f"Niveau: {get_pollution_level(row['measurements_parameter'], row['measurements_value'])}", 
-        axis=1
+    points = aggregate_points(data)
+    
+    points['level'] = get_pollution_levels(points['measurements_parameter'], points['measurements_value'])
+    # Concaténation colonne par colonne plutôt qu'un apply ligne à ligne
+    points['hover_text'] = (
+        "<b>" + points['location'].fillna('Localisation inconnue').astype(str) + "</b><br>"
+        + "Pays: " + points['country_name_en'].astype(object).fillna(points['country'].astype(str)).astype(str) + "<br>"
+        + "Polluant: " + points['measurements_parameter'].astype(str) + "<br>"
+        + "Valeur: " + points['measurements_value'].astype(str) + " " + points['measurements_unit'].astype(object).fillna('').astype(str) + "<br>"
+        + "Niveau: " + points['level']
+        + ("<br>Moyenne de " + points['count'].astype(str) + " mesures proches").where(points['count'] > 1, '')
     )
     
-    for pollutant in data['measurements_parameter'].unique():
-        pollutant_data = data[data['measurements_parameter'] == pollutant]
-        
-        fig.add_trace(go.Scattergeo(
-            lon=pollutant_data['lon'],
-            lat=pollutant_data['lat'],
-            mode='markers',
-            marker=dict(
-                size=6,
-                color=get_color_by_pollutant(pollutant),
-                opacity=0.7,
-                line=dict(width=1, color='white')
-            ),
-            name=pollutant,
-            text=pollutant_data['hover_text'],
-            hovertemplate='%{text}<extra></extra>'
-        ))
-    
-    fig.update_geos(
-        projection_type="natural earth",
-        visible=False,
-        showcountries=True,
-        showcoastlines=True,
-        coastlinecolor="#666666",
-        countrycolor="#333333",
-        countrywidth=0.5,
-        showland=False
-    )
-    
-    fig.update_layout(
-        margin=dict(l=0, r=0, t=0, b=0),
-        height=600,
-        showlegend=False,
-        geo=dict(
-            bgcolor='rgba(255,255,255,0)'
-        )
-    )
+    # Une seule trace pour tous les polluants : la couleur est portée par le code de polluant de chaque point
+    point_colors = pd.Categorical(points['measurements_parameter'], categories=POLLUTANT_ORDER).codes
+    point_colors = np.where(point_colors < 0, len(POLLUTANT_ORDER), point_colors).astype(np.int8)
+    
+    # Coordonnées en float32 : transmises en tableau typé base64 deux fois plus léger
+    fig.add_trace(go.Scattergeo(
+        lon=points['lon'].to_numpy(dtype=np.float32),
+        lat=points['lat'].to_numpy(dtype=np.float32),
+        mode='markers',
+        marker=dict(
+            size=np.rint(np.clip(4 + 2 * np.sqrt(points['count'].to_numpy()), MARKER_SIZE_MIN, MARKER_SIZE_MAX)).astype(np.uint8),
+            color=point_colors,
+            colorscale=POLLUTANT_COLORSCALE,
+            cmin=0,
+            cmax=len(POLLUTANT_ORDER),
+            showscale=False,
+            opacity=0.7,
+            line=dict(width=1, color='white')
+        ),
+        text=points['hover_text'],
+        hovertemplate='%{text}<extra></extra>',
+        showlegend=False
+    ))
     
     return fig
 
 
-selected_pollutants = set()
+@lru_cache(maxsize=128)
+def get_map_figure(year, pollutants_tuple):
+    """
+    Retourne la carte sous forme de dictionnaire JSON Plotly, directement utilisable comme figure d'un dcc.Graph.
+    Mise en cache en mémoire : un dictionnaire se relit bien plus vite qu'un go.Figure, dont chaque propriété
+    serait de nouveau validée par Plotly. Le cache vit avec le processus, un redémarrage après une modification
+    du code ou des données ne sert donc jamais une carte périmée. Le dictionnaire retourné est partagé,
+    il est donc en lecture seule.
+
+    :param year int: Année pour laquelle les données sont affichées
+    :param pollutants_tuple tuple Tuple trié des polluants sélectionnés, ou None si aucun filtre
+    :returns dict: Figure au format JSON Plotly (clés data et layout)
+    """
+    return create_map(year, pollutants_tuple).to_plotly_json()
+
+
+def create_map_patch(year, pollutants_tuple):
+    """
+    Construit une mise à jour partielle de la carte déjà affichée : seules les données des deux traces
+    (valeurs des pays et points de mesure) sont envoyées au navigateur, l'habillage et les
+    propriétés fixes des traces restent en place.
+
+    :param year int: Année pour laquelle les données sont affichées
+    :param pollutants_tuple tuple Tuple trié des polluants sélectionnés, ou None si aucun filtre
+    :returns dash.Patch: Modifications à appliquer à la figure de la carte
+    """
+    # Le JSON Plotly encode les tableaux numériques en binaire (bdata), bien plus compact que des listes
+    choropleth, points = get_map_figure(year, pollutants_tuple)['data']
+    
+    patched_figure = Patch()
+    patched_figure['data'][0]['z'] = choropleth['z']
+    patched_figure['data'][0]['zmin'] = choropleth['zmin']
+    patched_figure['data'][0]['zmax'] = choropleth['zmax']
+    patched_figure['data'][1]['lon'] = points['lon']
+    patched_figure['data'][1]['lat'] = points['lat']
+    patched_figure['data'][1]['marker']['color'] = points['marker']['color']
+    patched_figure['data'][1]['marker']['size'] = points['marker']['size']
+    patched_figure['data'][1]['text'] = points['text']
+    
+    return patched_figure
+
 
 app.layout = html.Div([
     html.H1("Dashboard - World Air Quality", style={'text-align':'center'}, className="page-title"),
     
     dcc.Store(id='active-tab', data='carte'),
+    dcc.Store(id='selected-pollutants', data=[]),
     
     create_navbar(),
     
@@ -376,16 +616,8 @@ app.layout = html.Div([
                         ], className='tooltip'),
                     ], className='legende'),
                     html.Div([
-                        html.Div([
-                            html.Button('PM2.5', id='btn-pm25', n_clicks=0),
-                            html.Button('PM10', id='btn-pm10', n_clicks=0),
-                            html.Button('CO', id='btn-co', n_clicks=0),
-                        ]),
-                        html.Div([
-                            html.Button('NO2', id='btn-no2', n_clicks=0),
-                            html.Button('SO2', id='btn-so2', n_clicks=0),
-                            html.Button('O3', id='btn-o3', n_clicks=0),
-                        ]),
+                        html.Div([create_pollutant_button(p) for p in ('PM2.5', 'PM10', 'CO')]),
+                        html.Div([create_pollutant_button(p) for p in ('NO2', 'SO2', 'O3')]),
                     ], className="buttons-polluants")
                 ], style={'display': 'flex', 'justify-content':'center'}, className="below-map"),
                 
@@ -431,13 +663,8 @@ def toggle_sections(carte_clicks, graphiques_clicks):
     :param graphiques_clicks int: Nombre de clics sur le bouton de navigation 'Graphiques'
     :returns tuple[dict, dict]: Styles CSS pour carte-section puis graphiques-section
     """
-    if ctx.triggered:
-        button_id = ctx.triggered[0]['prop_id'].split('.')[0]
-        
-        if button_id == 'nav-graphiques':
-            return {'display': 'none'}, {'display': 'block'}
-        else:
-            return {'display': 'block'}, {'display': 'none'}
+    if ctx.triggered_id == 'nav-graphiques':
+        return {'display': 'none'}, {'display': 'block'}
     
     return {'display': 'block'}, {'display': 'none'}
 
@@ -470,151 +697,151 @@ def update_years_lost_histogram(selected_year):
     return create_years_lost_histogram(year=selected_year)
 
 
-@app.callback(
+# Animation du slider gérée côté navigateur : ces callbacks ne touchent aucune donnée,
+# un aller-retour serveur toutes les 10 secondes serait inutile.
+app.clientside_callback(
+    """
+    function(n, current_year) {
+        // Anime automatiquement le slider d'année en boucle lorsque la lecture est active
+        const years = [2016, 2017, 2018, 2019, 2020, 2021, 2022, 2023, 2024, 2025];
+        const current_index = Math.max(years.indexOf(current_year), 0);
+        return years[(current_index + 1) % years.length];
+    }
+    """,
     Output('year-slider', 'value'),
     [Input('interval', 'n_intervals')],
     [State('year-slider', 'value')],
     prevent_initial_call=True
 )
-def animate_slider(n, current_year):
-    """
-    Anime automatiquement le slider d'année en boucle lorsque la lecture est active.
 
-    :param n int: Nombre de tiques écoulées depuis le démarrage de l'intervalle
-    :param current_year int: Année actuellement sélectionnée sur le slider
-    :returns int: Année suivante à afficher sur le slider
+app.clientside_callback(
     """
-    years = [2016, 2017, 2018, 2019, 2020, 2021, 2022, 2023, 2024, 2025]
-    
-    try:
-        current_index = years.index(current_year)
-    except ValueError:
-        current_index = 0
-    
-    next_index = (current_index + 1) % len(years)
-    return years[next_index]
-
-@app.callback(
+    function(n_clicks) {
+        // Active ou désactive l'animation automatique du slider et change le texte du bouton
+        const is_playing = (n_clicks || 0) % 2 === 1;
+        return is_playing ? [false, "⏸ Pause"] : [true, "▶ Play"];
+    }
+    """,
     [Output("interval", "disabled"),
      Output("play-pause-btn", "children")],
     [Input("play-pause-btn", "n_clicks")]
 )
-def play_pause(n_clicks):
+
+
+@app.callback(
+    Output('selected-pollutants', 'data'),
+    [Input({'type': 'poll-btn', 'name': ALL}, 'n_clicks')],
+    [State('selected-pollutants', 'data')],
+    prevent_initial_call=True
+)
+def update_selected_pollutants(n_clicks_list, current_selection):
     """
-    Active ou désactive l'animation automatique du slider.
+    Ajoute ou retire de la sélection le polluant dont le bouton vient d'être cliqué.
 
-    :param n_clicks int: Nombre total de clics sur le bouton 'Play'/'Pause'
-    :returns bool: True si l'intervalle doit être actif (lecture) + changement du texte, True pour pause + changement du texte
+    :param n_clicks_list list: Nombre de clics de chaque bouton de polluant
+    :param current_selection list: Polluants sélectionnés par ce client, lus depuis le dcc.Store
+    :returns list: Nouvelle sélection triée
     """
+    selected_pollutants = set(current_selection or [])
+    pollutant = ctx.triggered_id['name']
     
-    if n_clicks is None or n_clicks == 0:
-        return True, "▶ Play"
-    
-    is_playing = (n_clicks % 2) == 1
-    
-    if is_playing:
-        return False, "⏸ Pause"
+    if pollutant in selected_pollutants:
+        selected_pollutants.remove(pollutant)
     else:
-        return True, "▶ Play"
+        selected_pollutants.add(pollutant)
+    
+    return sorted(selected_pollutants)
+
+
+# Styles des boutons calculés côté navigateur à partir de la sélection : fond coloré si actif,
+# fond blanc avec bordure colorée sinon
+app.clientside_callback(
+    """
+    function(selection, ids) {
+        const colors = __POLLUTANT_COLORS__;
+        return ids.map(function(id) {
+            const color = colors[id.name] || "__DEFAULT_POLLUTANT_COLOR__";
+            const is_selected = (selection || []).includes(id.name);
+            return {
+                backgroundColor: is_selected ? color : 'white',
+                color: is_selected ? 'white' : color,
+                border: '2px solid ' + color,
+                fontWeight: is_selected ? 'bold' : 'normal',
+                transition: 'all 0.3s ease',
+                width: '10rem',
+                height: '3rem',
+                borderRadius: '10px',
+                margin: '0.5rem',
+                cursor: 'pointer'
+            };
+        });
+    }
+    """.replace('__POLLUTANT_COLORS__', json.dumps(POLLUTANT_COLORS))
+       .replace('__DEFAULT_POLLUTANT_COLOR__', DEFAULT_POLLUTANT_COLOR),
+    Output({'type': 'poll-btn', 'name': ALL}, 'style'),
+    [Input('selected-pollutants', 'data')],
+    [State({'type': 'poll-btn', 'name': ALL}, 'id')]
+)
+
+
+# Liste des polluants sélectionnés, chacun dans sa couleur, construite côté navigateur
+app.clientside_callback(
+    """
+    function(selection) {
+        const colors = __POLLUTANT_COLORS__;
+        if (!selection || selection.length === 0) {
+            return "Tous";
+        }
+        const display = [];
+        selection.slice().sort().forEach(function(pollutant, i) {
+            if (i > 0) {
+                display.push(", ");
+            }
+            display.push({
+                namespace: 'dash_html_components',
+                type: 'Span',
+                props: {
+                    children: pollutant,
+                    style: {color: colors[pollutant] || "__DEFAULT_POLLUTANT_COLOR__", fontWeight: 'bold'}
+                }
+            });
+        });
+        return display;
+    }
+    """.replace('__POLLUTANT_COLORS__', json.dumps(POLLUTANT_COLORS))
+       .replace('__DEFAULT_POLLUTANT_COLOR__', DEFAULT_POLLUTANT_COLOR),
+    Output('polluant', 'children'),
+    [Input('selected-pollutants', 'data')]
+)
 
 
 @app.callback(
     [Output('carte', 'figure'),
      Output('nb-pays', 'children'),
-     Output('polluant', 'children'),
-     Output('ranking-table', 'children'),
-     Output('btn-pm25', 'style'),
-     Output('btn-pm10', 'style'),
-     Output('btn-co', 'style'),
-     Output('btn-no2', 'style'),
-     Output('btn-so2', 'style'),
-     Output('btn-o3', 'style')],
+     Output('ranking-table', 'children')],
     [Input('year-slider', 'value'),
-     Input('btn-pm25', 'n_clicks'),
-     Input('btn-pm10', 'n_clicks'),
-     Input('btn-co', 'n_clicks'),
-     Input('btn-no2', 'n_clicks'),
-     Input('btn-so2', 'n_clicks'),
-     Input('btn-o3', 'n_clicks')]
+     Input('selected-pollutants', 'data')]
 )
-def update_map(selected_year, pm25_clicks, pm10_clicks, co_clicks, no2_clicks, so2_clicks, o3_clicks):
+def update_map(selected_year, selected_pollutants):
     """
-    Callback central : met à jour la carte, les KPIs, le tableau de classement Top 5
-    et les styles des boutons de polluants selon l'année et les filtres actifs.
+    Callback central : met à jour la carte, le nombre de pays et le tableau de classement Top 5
+    selon l'année et les polluants sélectionnés.
 
     :param selected_year int: Année choisie via le slider
-    :param pm25_clicks int: Nombre de clics sur le bouton PM2.5
-    :param pm10_clicks int: Nombre de clics sur le bouton PM10
-    :param co_clicks int: Nombre de clics sur le bouton CO
-    :param no2_clicks int: Nombre de clics sur le bouton NO2
-    :param so2_clicks int: Nombre de clics sur le bouton SO2
-    :param o3_clicks int: Nombre de clics sur le bouton O3
-    :returns tuple: Figure carte, nombre de pays (str), affichage polluant, tableau HTML Top 5, puis 6 dicts de styles CSS pour les boutons
-    """
-    
-    global selected_pollutants
-    
-    if ctx.triggered:
-        button_id = ctx.triggered[0]['prop_id'].split('.')[0]
-        pollutant_map = {
-            'btn-pm25': 'PM2.5',
-            'btn-pm10': 'PM10',
-            'btn-co': 'CO',
-            'btn-no2': 'NO2',
-            'btn-so2': 'SO2',
-            'btn-o3': 'O3'
-        }
-        
-        if button_id in pollutant_map:
-            pollutant = pollutant_map[button_id]
-            if pollutant in selected_pollutants:
-                selected_pollutants.remove(pollutant)
-            else:
-                selected_pollutants.add(pollutant)
+    :param selected_pollutants list: Polluants sélectionnés par ce client, lus depuis le dcc.Store
+    :returns tuple: Figure carte, nombre de pays (str), tableau HTML Top 5
+    """
     
-    pollutants_tuple = tuple(sorted(selected_pollutants)) if len(selected_pollutants) > 0 else None
+    pollutants_tuple = tuple(sorted(selected_pollutants)) if selected_pollutants else None
     
     data_filtered = get_filtered_data(selected_year, pollutants_tuple)
     
     nb_pays = data_filtered['country'].nunique()
     
-    if pollutants_tuple:
-        polluant_display = []
-        for i, pollutant in enumerate(sorted(pollutants_tuple)):
-            color = get_color_by_pollutant(pollutant)
-            polluant_display.append(
-                html.Span(pollutant, style={'color': color, 'fontWeight': 'bold'})
-            )
-            if i < len(pollutants_tuple) - 1:
-                polluant_display.append(", ")
-    else:
-        polluant_display = "Tous"
-    
-    top_countries = data_filtered.groupby(['country', 'country_name_en']).agg({
-        'measurements_value': 'mean',
-        'measurements_unit': 'first',
-        'measurements_lastupdated': 'max'
-    }).reset_index()
-    
-    top_countries = top_countries.sort_values('measurements_value', ascending=False).head(5)
-    
-    table_rows = []
-    for idx, row in top_countries.iterrows():
-        rank = len(table_rows) + 1
-        country_name = row['country_name_en'] if pd.notna(row['country_name_en']) else row['country']
-        unit = row['measurements_unit'] if pd.notna(row['measurements_unit']) else 'µg/m³'
-        value = f"{row['measurements_value']:.2f}"
-        date = pd.to_datetime(row['measurements_lastupdated']).strftime('%d/%m/%Y')
-        
-        table_rows.append(
-            html.Tr([
-                html.Td(f"#{rank}"),
-                html.Td(country_name),
-                html.Td(unit),
-                html.Td(value),
-                html.Td(date),
-            ])
-        )
+    table_rows = [
+        html.Tr([html.Td(cell) for cell in row])
+        for row in get_ranking_rows(selected_year, pollutants_tuple)
+    ]
     
     ranking_table = html.Table([
         html.Thead([
@@ -629,42 +856,28 @@ def update_map(selected_year, pm25_clicks, pm10_clicks, co_clicks, no2_clicks, s
         html.Tbody(table_rows)
     ])
     
-    fig = create_map(selected_year, pollutants_tuple)
+    # Figure complète au premier rendu, simple mise à jour des données ensuite
+    if ctx.triggered_id is None:
+        fig = get_map_figure(selected_year, pollutants_tuple)
+    else:
+        fig = create_map_patch(selected_year, pollutants_tuple)
     
-    def get_button_style(pollutant):
-        """
-        Génère le style CSS d'un bouton de sélection de polluant.
-        Fond coloré si actif, fond blanc avec bordure colorée sinon.
+    return fig, str(nb_pays), ranking_table
+
+def warm_up_cache():
+    """
+    Pré-calcule la carte et le classement de chaque année, sans filtre puis pour chaque polluant seul,
+    afin que les premières interactions soient servies depuis le cache.
+    """
+    for year in range(2016, 2026):
+        for pollutants_tuple in [None] + [(pollutant,) for pollutant in POLLUTANT_ORDER]:
+            get_map_figure(year, pollutants_tuple)
+            get_ranking_rows(year, pollutants_tuple)
 
-        :param pollutant str: Nom du polluant associé au bouton
-        :returns dict: Dictionnaire de styles CSS
-        """
-        color = get_color_by_pollutant(pollutant)
-        is_selected = pollutant in selected_pollutants
-        
-        return {
-            'backgroundColor': color if is_selected else 'white',
-            'color': 'white' if is_selected else color,
-            'border': f'2px solid {color}',
-            'fontWeight': 'bold' if is_selected else 'normal',
-            'transition': 'all 0.3s ease',
-            'width': '10rem',
-            'height': '3rem',
-            'borderRadius': '10px',
-            'margin': '0.5rem',
-            'cursor': 'pointer'
-        }
-    
-    styles = [
-        get_button_style('PM2.5'),
-        get_button_style('PM10'),
-        get_button_style('CO'),
-        get_button_style('NO2'),
-        get_button_style('SO2'),
-        get_button_style('O3')
-    ]
-    
-    return fig, str(nb_pays), polluant_display, ranking_table, *styles
 
 if __name__ == '__main__':
+    # Avec debug=True, le rechargeur de Werkzeug relance le script dans un processus enfant, seul à servir
+    # les requêtes : le préchauffage n'y est fait qu'une fois, en tâche de fond pour ne pas retarder le démarrage
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        threading.Thread(target=warm_up_cache, daemon=True).start()
     app.run(debug=True)
\ No newline at end of file
@@ -3,37 +3,80 @@ Composant : Graphique en barres de l'espérance de vie par région
 """
 from dash import html, dcc
 import plotly.graph_objects as go
-import geopandas as gpd
+import numpy as np
 import pandas as pd
-from src.utils.mapping_region import get_region, calculate_years_lost
+from functools import lru_cache
+from src.utils.data_loader import load_measurements
+from src.utils.mapping_region import calculate_years_lost_vec, get_regions
 
 
-def create_life_expectancy_graph(year=None):
+def load_pm25_data():
     """
-    Crée le graphique en barres du dividende d'espérance de vie par région
-    
-    :param year int: Année à filtrer (None pour toutes les années)
-    :returns plotly.graph_objects.Figure: Graphique Plotly
+    Extrait des mesures partagées (load_measurements) les PM2.5 utiles au graphique et leur associe
+    leur région et les années de vie perdues, qui ne dépendent pas de l'année sélectionnée.
+    Appelée une seule fois au démarrage (voir build_regional_summary).
+
+    :returns pandas.DataFrame: Mesures de PM2.5 avec les colonnes country, measurements_value, year, region et years_lost
     """
+    data = load_measurements()
+    data = data.loc[data['measurements_parameter'] == 'PM2.5', ['country', 'measurements_value', 'year']].copy()
+    # Catégorie triée : fixe l'ordre des régions suivi par le reindex et le reshape du résumé (build_regional_summary)
+    data['region'] = get_regions(data['country'])
+    data['years_lost'] = calculate_years_lost_vec(data['measurements_value'])
+    return data
 
-    data = gpd.read_file("data/cleaned/cleaneddata.geojson")
+
+def build_regional_summary(data):
+    """
+    Agrège une seule fois les mesures par (année, région) : somme des années perdues, somme des PM2.5
+    et nombre de mesures. Le graphique n'a ensuite plus qu'à sommer quelques lignes de ce petit tableau.
+    Les sommes passent par un groupby pandas (sommation compensée) plutôt que np.bincount : les moyennes
+    d'années perdues arrondies au centième tombent souvent à mi-chemin de deux centièmes, et seule
+    cette sommation les arrondit comme la moyenne groupby affichée jusqu'ici.
+
+    :param data pandas.DataFrame: Mesures de PM2.5 (voir load_pm25_data)
+    :returns tuple: (années, régions, sommes des années perdues, sommes des PM2.5, nombres de mesures),
+                    les trois derniers de forme (années, régions)
+    """
+    years = np.unique(data['year'].to_numpy())
+    regions = data['region'].cat.categories
+    shape = (len(years), len(regions))
     
-    data = data[data['measurements_parameter'] == 'PM2.5']
+    cells = data.groupby(['year', 'region'], observed=False)[['years_lost', 'measurements_value']].agg(['sum', 'count'])
+    cells = cells.reindex(pd.MultiIndex.from_product([years, regions]), fill_value=0)
     
-    if year is not None:
-        data['measurements_lastupdated'] = pd.to_datetime(data['measurements_lastupdated'])
-        data = data[data['measurements_lastupdated'].dt.year == year]
+    return (
+        years,
+        regions,
+        cells[('years_lost', 'sum')].to_numpy().reshape(shape),
+        cells[('measurements_value', 'sum')].to_numpy().reshape(shape),
+        cells[('years_lost', 'count')].to_numpy().reshape(shape)
+    )
+
+# Résumé calculé une fois à l'import plutôt que de regrouper les mesures à chaque callback
+SUMMARY_YEARS, SUMMARY_REGIONS, YEARS_LOST_SUMS, PM25_SUMS, MEASUREMENT_COUNTS = build_regional_summary(load_pm25_data())
+
+
+@lru_cache(maxsize=16)
+def create_life_expectancy_graph(year=None):
+    """
+    Crée le graphique en barres du dividende d'espérance de vie par région.
+    Mis en cache par année : l'animation du slider repasse sans cesse sur les mêmes 10 années.
     
-    data['region'] = data['country'].apply(get_region)
-    data['years_lost'] = data['measurements_value'].apply(calculate_years_lost)
+    :param year int: Année à filtrer (None pour toutes les années)
+    :returns plotly.graph_objects.Figure: Graphique Plotly
+    """
+    rows = slice(None) if year is None else SUMMARY_YEARS == year
     
-    regional_data = data.groupby('region').agg({
-        'years_lost': 'mean',
-        'measurements_value': 'mean',
-        'country': 'count'
-    }).reset_index()
+    nb_measurements = MEASUREMENT_COUNTS[rows].sum(axis=0)
+    measured = nb_measurements > 0
     
-    regional_data.columns = ['region', 'avg_years_lost', 'avg_pm25', 'nb_measurements']
+    regional_data = pd.DataFrame({
+        'region': SUMMARY_REGIONS[measured],
+        'avg_years_lost': YEARS_LOST_SUMS[rows].sum(axis=0)[measured] / nb_measurements[measured],
+        'avg_pm25': PM25_SUMS[rows].sum(axis=0)[measured] / nb_measurements[measured],
+        'nb_measurements': nb_measurements[measured]
+    })
     
     regional_data = regional_data[regional_data['region'] != 'Autre']
     regional_data = regional_data.sort_values('avg_years_lost', ascending=True)
@@ -3,38 +3,58 @@ Composant : Histogramme des années perdues selon les intervalles de PM2.5
 """
 from dash import html, dcc
 import plotly.graph_objects as go
-import geopandas as gpd
+import numpy as np
 import pandas as pd
-from src.utils.mapping_region import calculate_years_lost
+from functools import lru_cache
+from src.utils.data_loader import load_measurements
+from src.utils.mapping_region import calculate_years_lost_vec
 
 
+def load_pm25_data():
+    """
+    Extrait des mesures partagées (load_measurements) les valeurs de PM2.5 utiles à l'histogramme.
+    Appelée une seule fois au démarrage (voir _PM25_DATA).
+
+    :returns pandas.DataFrame: Mesures de PM2.5 avec les colonnes measurements_value et year
+    """
+    data = load_measurements()
+    return data.loc[data['measurements_parameter'] == 'PM2.5', ['measurements_value', 'year']].copy()
+
+# Extraites une fois à l'import plutôt qu'à chaque callback
+_PM25_DATA = load_pm25_data()
+
+
+@lru_cache(maxsize=16)
 def create_years_lost_histogram(year):
     """
-    Crée un histogramme montrant les années perdues selon les intervalles de PM2.5
+    Crée un histogramme montrant les années perdues selon les intervalles de PM2.5.
+    Mis en cache par année : l'animation du slider repasse sans cesse sur les mêmes 10 années.
     
     :param year int: Année à filtrer
     :returns plotly.graph_objects.Figure: Graphique Plotly
     """
-    data = gpd.read_file("data/cleaned/cleaneddata.geojson")
-    data['measurements_lastupdated'] = pd.to_datetime(data['measurements_lastupdated'])
-    
-    data_filtered = data[
-        (data['measurements_lastupdated'].dt.year == year) &
-        (data['measurements_parameter'] == 'PM2.5')
-    ]
-    
-    data_filtered['years_lost'] = data_filtered['measurements_value'].apply(calculate_years_lost)
+    data_filtered = _PM25_DATA[_PM25_DATA['year'] == year]
+    values = data_filtered['measurements_value'].to_numpy()
+    years_lost = calculate_years_lost_vec(values)
     
     bins = [0, 5, 15, 25, 35, 50, 75, 100, 150, 200, 500]
     labels = ['0-5', '5-15', '15-25', '25-35', '35-50', '50-75', '75-100', '100-150', '150-200', '200+']
-    data_filtered['pm25_range'] = pd.cut(data_filtered['measurements_value'], bins=bins, labels=labels, include_lowest=True)
     
-    range_stats = data_filtered.groupby('pm25_range', observed=True).agg({
-        'years_lost': 'mean',
-        'measurements_value': 'count'
-    }).reset_index()
+    # Intervalles ]a, b] comme pd.cut, le premier incluant sa borne basse (include_lowest)
+    range_index = np.searchsorted(bins, values, side='left') - 1
+    range_index[values == bins[0]] = 0
+    in_range = (range_index >= 0) & (range_index < len(labels))
+    
+    # Effectifs et sommes par intervalle en une passe (np.bincount) ; les intervalles vides sont écartés
+    counts = np.bincount(range_index[in_range], minlength=len(labels))
+    sums = np.bincount(range_index[in_range], weights=years_lost[in_range], minlength=len(labels))
+    observed = counts > 0
     
-    range_stats.columns = ['pm25_range', 'avg_years_lost', 'count']
+    range_stats = pd.DataFrame({
+        'pm25_range': np.array(labels)[observed],
+        'avg_years_lost': sums[observed] / counts[observed],
+        'count': counts[observed]
+    })
     
     fig = go.Figure()
     
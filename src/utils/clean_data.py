@@ -5,56 +5,81 @@ pour pouvoir être utilisées dans le dashboard final.
 """
 import pandas as pd
 import numpy as np
+import geopandas as gpd
 import json
 
+# Polluants conservés dans les deux formats de données
+POLLUANTS_GARDES = frozenset(['PM2.5', 'PM10', 'CO', 'NO2', 'SO2', 'O3'])
+
+# Colonnes du CSV brut réellement utilisées par le nettoyage
+COLONNES_CSV = [
+    'Country Code', 'Country Label', 'City', 'Location', 'Coordinates',
+    'Pollutant', 'Value', 'Unit', 'Last Updated', 'Source Name'
+]
+
+# Colonnes de texte très répétitives, stockées en catégories
+COLONNES_CATEGORIES = ['Pollutant', 'Country Label', 'Country Code', 'Unit', 'Source Name']
+
+# Colonnes du CSV nettoyé, dans l'ordre d'écriture
+COLONNES_FINALES = [
+    'Country Code', 'Country Label', 'City', 'Location', 
+    'Latitude', 'Longitude', 'Pollutant', 'Value', 'Unit',
+    'Date', 'Year', 'Month', 'Last Updated', 'Source Name'
+]
+
 def nettoyer_csv(fichier_entree, fichier_sortie='../../data/cleaned/cleaneddata.csv'):
     """
     Nettoie les données de pollution au format CSV : filtrage des polluants,
     extraction des coordonnées, conversion des dates, suppression des valeurs
     manquantes ou négatives, puis sauvegarde avec une sélection et un tri des colonnes.
+    Un chemin de sortie en .parquet écrit un fichier Parquet (zstd) au lieu d'un CSV.
 
     :param fichier_entree str: Chemin vers le fichier CSV d'entrée
-    :param fichier_sortie str: Chemin vers le fichier CSV nettoyé en sortie
+    :param fichier_sortie str: Chemin vers le fichier nettoyé en sortie (.csv ou .parquet)
     :returns DataFrame: DataFrame pandas nettoyé et trié
     """
     
-    df = pd.read_csv(fichier_entree, sep=';', encoding='utf-8')
-    
-    polluants_gardes = ['PM2.5', 'PM10', 'CO', 'NO2', 'SO2', 'O3']
+    # Lecteur CSV d'Arrow : analyse multithreadée des colonnes, limitée à celles qui servent.
+    # Sa conversion des nombres est exacte : les valeurs sont relues telles qu'écrites dans le brut,
+    # là où le lecteur C de pandas (sans float_precision='round_trip') en décalait certaines d'un bit
+    # Peu de valeurs distinctes : lues directement en catégories, isin et le tri comparent des codes entiers
+    df = pd.read_csv(fichier_entree, sep=';', encoding='utf-8', engine='pyarrow', usecols=COLONNES_CSV,
+                     dtype=dict.fromkeys(COLONNES_CATEGORIES, 'category'))
     
     print("\nFiltrage des polluants...")
-    df_filtre = df[df['Pollutant'].isin(polluants_gardes)].copy()
-    
-    print(f"{len(df_filtre)} lignes conservées sur {len(df)} ({len(df_filtre)/len(df)*100:.1f}%)")
-    
-    def extraire_coordonnees(coord_str):
-        """
-        Parse une chaîne de coordonnées au format 'lat, lon' en deux flottants.
-        Retourne (NaN, NaN) si la chaîne est absente ou mal formée.
-
-        :param coord_str str: Chaîne de caractères au format 'latitude, longitude'
-        :returns tuple: Tuple (latitude, longitude) sous forme de floats, ou (NaN, NaN)
-        """
+    nb_lignes = len(df)
+    # Copie explicite : les colonnes ajoutées ensuite modifient un DataFrame indépendant du brut
+    df_filtre = df.loc[df['Pollutant'].isin(POLLUANTS_GARDES)].copy()
+    
+    print(f"{len(df_filtre)} lignes conservées sur {nb_lignes} ({len(df_filtre)/nb_lignes*100:.1f}%)")
+    
+    # Découpage de 'lat, lon' en une passe sur toute la colonne ; les valeurs absentes
+    # ou mal formées deviennent NaN
+    coordonnees = df_filtre['Coordinates'].astype(str).str.split(',', expand=True)
+    for colonne, partie in (('Latitude', 0), ('Longitude', 1)):
+        if partie not in coordonnees:
+            df_filtre[colonne] = np.nan
+            continue
+        valeurs = coordonnees[partie].str.strip()
         try:
-            if pd.isna(coord_str):
-                return np.nan, np.nan
-            coords = str(coord_str).split(',')
-            lat = float(coords[0].strip())
-            lon = float(coords[1].strip())
-            return lat, lon
-        except:
-            return np.nan, np.nan
-    
-    df_filtre[['Latitude', 'Longitude']] = df_filtre['Coordinates'].apply(
-        lambda x: pd.Series(extraire_coordonnees(x))
-    )
+            # astype(float) reprend exactement la conversion de float() sur chaque chaîne
+            df_filtre[colonne] = valeurs.astype(float)
+        except ValueError:
+            # Valeurs mal formées : NaN, les autres gardent la conversion exacte
+            valides = pd.to_numeric(valeurs, errors='coerce').notna()
+            df_filtre[colonne] = valeurs.where(valides).astype(float)
     
-    df_filtre['Last Updated'] = pd.to_datetime(df_filtre['Last Updated'], errors='coerce', utc=True)
+    # Arrow reconnaît déjà les horodatages ISO 8601 ; s'il a laissé du texte, le format explicite
+    # évite la détection ligne par ligne
+    df_filtre['Last Updated'] = pd.to_datetime(df_filtre['Last Updated'], format='ISO8601', errors='coerce', utc=True)
     
     if pd.api.types.is_datetime64_any_dtype(df_filtre['Last Updated']):
-        df_filtre['Date'] = df_filtre['Last Updated'].dt.date
-        df_filtre['Year'] = df_filtre['Last Updated'].dt.year
-        df_filtre['Month'] = df_filtre['Last Updated'].dt.month
+        horodatages = df_filtre['Last Updated']
+        # Jour calendaire UTC en datetime64 plutôt qu'un objet datetime.date par ligne ;
+        # types entiers nullables pour conserver les dates non reconnues (NaT)
+        df_filtre['Date'] = horodatages.values.astype('datetime64[D]')
+        df_filtre['Year'] = horodatages.dt.year.astype('Int16')
+        df_filtre['Month'] = horodatages.dt.month.astype('Int8')
     else:
         print("Problème de conversion des dates")
         df_filtre['Date'] = None
@@ -65,25 +90,56 @@ def nettoyer_csv(fichier_entree, fichier_sortie='../../data/cleaned/cleaneddata.
     
     print("\nSuppression des valeurs manquantes critiques...")
     avant = len(df_filtre)
-    df_filtre = df_filtre.dropna(subset=['Value', 'Latitude', 'Longitude', 'Country Label'])
-    df_filtre = df_filtre[df_filtre['Value'] >= 0]
+    # Un seul masque pour les valeurs manquantes et négatives (NaN >= 0 est faux) : une seule copie
+    masque = (
+        (df_filtre['Value'] >= 0) &
+        df_filtre['Latitude'].notna() &
+        df_filtre['Longitude'].notna() &
+        df_filtre['Country Label'].notna()
+    )
+    df_filtre = df_filtre.loc[masque]
     print(f"{avant - len(df_filtre)} lignes supprimées")
     
-    colonnes_finales = [
-        'Country Code', 'Country Label', 'City', 'Location', 
-        'Latitude', 'Longitude', 'Pollutant', 'Value', 'Unit',
-        'Date', 'Year', 'Month', 'Last Updated', 'Source Name'
-    ]
-    df_filtre = df_filtre[colonnes_finales]
+    df_filtre = df_filtre[COLONNES_FINALES]
     df_filtre = df_filtre.sort_values(['Country Label', 'Last Updated'], ascending=[True, False])
     
-    df_filtre.to_csv(fichier_sortie, index=False, encoding='utf-8')
+    if fichier_sortie.endswith('.parquet'):
+        # Écriture en colonnes : catégories et horodatages UTC sont relus sans conversion
+        df_filtre.to_parquet(fichier_sortie, index=False, compression='zstd')
+    else:
+        df_filtre.to_csv(fichier_sortie, index=False, encoding='utf-8')
     print(f"Fichier sauvegardé : {fichier_sortie}")
     
     return df_filtre
 
 
-def nettoyer_geojson(fichier_entree, fichier_sortie='../../data/cleaned/cleaneddata.geojson'):
+def feature_valide(feature):
+    """
+    Indique si une feature GeoJSON doit être conservée : polluant suivi, valeur positive ou nulle
+    et géométrie avec deux coordonnées renseignées.
+
+    :param feature dict: Feature GeoJSON brute
+    :returns bool: True si la feature est conservée
+    """
+    try:
+        props = feature.get('properties')
+        geometry = feature.get('geometry')
+        if not props or not geometry:
+            return False
+        
+        coords = geometry.get('coordinates')
+        value = props.get('measurements_value')
+        
+        return bool(props.get('measurements_parameter') in POLLUANTS_GARDES and
+                    value is not None and
+                    value >= 0 and
+                    coords and len(coords) == 2 and
+                    coords[0] is not None and coords[1] is not None)
+    except (KeyError, TypeError, AttributeError):
+        return False
+
+
+def nettoyer_geojson(fichier_entree, fichier_sortie='../../data/cleaned/cleaneddata.geojson', indente=False):
     """
     Nettoie les données de pollution au format GeoJSON : filtrage des polluants,
     validation de la géométrie et des coordonnées, suppression des features avec
@@ -91,43 +147,20 @@ def nettoyer_geojson(fichier_entree, fichier_sortie='../../data/cleaned/cleanedd
 
     :param fichier_entree str: Chemin vers le fichier GeoJSON d'entrée
     :param fichier_sortie str: Chemin vers le fichier GeoJSON nettoyé en sortie
+    :param indente bool: Écrit un JSON indenté, lisible mais bien plus lent à produire
     :returns dict: Dictionnaire GeoJSON nettoyé
     """
     
     with open(fichier_entree, 'r', encoding='utf-8') as f:
         data = json.load(f)
     
-    polluants_gardes = ['PM2.5', 'PM10', 'CO', 'NO2', 'SO2', 'O3']
+    features = data['features']
+    nb_features = len(features)
     
     print("\nFiltrage des polluants...")
-    features_filtrees = []
-    
-    for feature in data['features']:
-        try:
-            if not feature.get('properties') or not feature.get('geometry'):
-                continue
-            
-            props = feature['properties']
-            geometry = feature['geometry']
-            
-            if not geometry or not geometry.get('coordinates'):
-                continue
-            
-            coords = geometry['coordinates']
-            polluant = props.get('measurements_parameter')
-            value = props.get('measurements_value')
-            
-            if (polluant in polluants_gardes and 
-                value is not None and 
-                value >= 0 and
-                coords and len(coords) == 2 and
-                coords[0] is not None and coords[1] is not None):
-                
-                features_filtrees.append(feature)
-        except (KeyError, TypeError, AttributeError) as e:
-            continue
+    features_filtrees = [feature for feature in features if feature_valide(feature)]
     
-    print(f"{len(features_filtrees)} features conservées sur {len(data['features'])} ({len(features_filtrees)/len(data['features'])*100:.1f}%)")
+    print(f"{len(features_filtrees)} features conservées sur {nb_features} ({len(features_filtrees)/nb_features*100:.1f}%)")
     
     geojson_propre = {
         "type": "FeatureCollection",
@@ -135,13 +168,39 @@ def nettoyer_geojson(fichier_entree, fichier_sortie='../../data/cleaned/cleanedd
     }
     
     with open(fichier_sortie, 'w', encoding='utf-8') as f:
-        json.dump(geojson_propre, f, ensure_ascii=False, indent=2)
+        if indente:
+            json.dump(geojson_propre, f, ensure_ascii=False, indent=2)
+        else:
+            # Fichier destiné à être relu par le script : JSON compact, sans espaces. json.dumps
+            # passe par l'encodeur C, alors que json.dump écrit morceau par morceau en Python
+            f.write(json.dumps(geojson_propre, ensure_ascii=False, separators=(',', ':')))
     
     print(f"Fichier sauvegardé : {fichier_sortie}")
     
     return geojson_propre
 
 
+def convertir_geoparquet(fichier_entree='../../data/cleaned/cleaneddata.geojson',
+                         fichier_sortie='../../data/cleaned/cleaneddata.parquet'):
+    """
+    Convertit le GeoJSON nettoyé au format GeoParquet (stockage en colonnes,
+    géométries encodées en WKB), bien plus rapide à relire que le GeoJSON texte.
+    Les coordonnées sont aussi écrites dans des colonnes lat/lon, ce qui permet au dashboard
+    de relire le fichier avec pandas sans reconstruire les géométries.
+
+    :param fichier_entree str: Chemin vers le fichier GeoJSON nettoyé
+    :param fichier_sortie str: Chemin vers le fichier GeoParquet en sortie
+    :returns geopandas.GeoDataFrame: Données converties
+    """
+    data = gpd.read_file(fichier_entree)
+    data['lat'] = data.geometry.y
+    data['lon'] = data.geometry.x
+    data.to_parquet(fichier_sortie, index=False)
+    print(f"Fichier sauvegardé : {fichier_sortie}")
+    
+    return data
+
+
 if __name__ == "__main__":
     
     # Nettoyer un fichier CSV
@@ -164,4 +223,11 @@ if __name__ == "__main__":
     except Exception as e:
         print(f"Erreur GeoJSON : {str(e)}")
     
+    # Convertir le GeoJSON nettoyé en GeoParquet pour le dashboard
+    try:
+        convertir_geoparquet()
+        print("\nConversion GeoParquet terminée avec succès !")
+    except Exception as e:
+        print(f"Erreur GeoParquet : {str(e)}")
+    
     print("Nettoyage terminé !")
\ No newline at end of file
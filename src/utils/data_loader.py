@@ -0,0 +1,34 @@
+"""
+Chargement des données nettoyées utilisées par le dashboard.
+Le fichier GeoParquet est lu une seule fois puis partagé entre la carte et les graphiques.
+"""
+import pandas as pd
+from functools import lru_cache
+
+DATA_PATH = "data/cleaned/cleaneddata.parquet"
+
+# Colonnes utiles au dashboard : la géométrie est remplacée par les colonnes lat/lon
+COLUMNS = [
+    'country', 'country_name_en', 'location', 'measurements_parameter', 'measurements_value',
+    'measurements_unit', 'measurements_lastupdated', 'lat', 'lon'
+]
+
+
+@lru_cache(maxsize=1)
+def load_measurements():
+    """
+    Lit les colonnes utiles du fichier nettoyé, ajoute l'année de chaque mesure et convertit
+    les colonnes de texte répétitives en catégories.
+    Mise en cache : le fichier ne change pas pendant l'exécution. Le DataFrame retourné est partagé,
+    les appelants ne doivent donc pas le modifier en place.
+
+    :returns pandas.DataFrame: Mesures nettoyées avec la colonne year
+    """
+    data = pd.read_parquet(DATA_PATH, columns=COLUMNS)
+    # measurements_lastupdated est déjà stocké en horodatage UTC dans le Parquet : aucune conversion à faire
+    data['year'] = data['measurements_lastupdated'].dt.year.astype('int16')
+    # ~125 pays, 6 polluants et 3 unités distincts : les codes entiers d'une catégorie
+    # réduisent la mémoire et accélèrent les comparaisons, nunique, groupby et isin
+    for column in ('country', 'country_name_en', 'measurements_parameter', 'measurements_unit'):
+        data[column] = data[column].astype('category')
+    return data
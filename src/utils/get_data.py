@@ -4,10 +4,15 @@ Récupère les données et les met dans des fichiers au format CSV et GeoJSON.
 """
 import os
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import pandas as pd
 import json
 from dotenv import load_dotenv
 import time
+import threading
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 
 load_dotenv()
 
@@ -17,6 +22,192 @@ API_KEY = os.getenv('OPENAQ_API_KEY')
 if not API_KEY:
     raise ValueError("Clé API manquante ! Vérifier que OPENAQ_API_KEY est dans le fichier .env")
 
+# Nombre de polluants récupérés en parallèle : les requêtes passent l'essentiel de leur temps
+# à attendre le réseau, plusieurs threads suffisent à recouvrir ces attentes
+MAX_WORKERS = 3
+
+# ID numérique de chaque polluant dans l'API OpenAQ v3, indexé par nom en minuscules
+PARAMETER_IDS = {
+    'pm25': 2,
+    'pm2.5': 2,
+    'pm10': 1,
+    'no2': 3,
+    'so2': 5,
+    'o3': 4,
+    'co': 6
+}
+
+# URLs des endpoints, construites une seule fois (une URL /latest par ID de polluant)
+COUNTRIES_URL = f"{BASE_URL}/countries"
+LOCATIONS_URL = f"{BASE_URL}/locations"
+LATEST_URLS = {parameter_id: f"{BASE_URL}/parameters/{parameter_id}/latest" for parameter_id in set(PARAMETER_IDS.values())}
+
+# Session partagée : en-tête d'authentification défini une fois et connexions HTTP réutilisées
+# (keep-alive) d'une requête à l'autre au lieu d'une nouvelle connexion TLS à chaque page
+_SESSION = requests.Session()
+_SESSION.headers['X-API-Key'] = API_KEY
+# Un pool d'une connexion par thread de récupération. Les erreurs serveur passagères (502, 503, 504)
+# sont renvoyées par urllib3 ; les 429 restent gérés par _request_with_retry (Retry-After, limiteur)
+_SESSION.mount('https://', HTTPAdapter(
+    pool_connections=1,
+    pool_maxsize=MAX_WORKERS,
+    max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[502, 503, 504],
+                      allowed_methods=['GET'], raise_on_status=False)
+))
+
+# Limite de l'API OpenAQ v3 : 60 requêtes par minute. Les requêtes partent au plus vite tant
+# que la réserve de jetons le permet, au lieu d'attendre un délai fixe entre chaque page.
+# Réserve pleine plus une minute de remplissage : jamais plus de RATE_LIMIT_PER_MINUTE requêtes sur 60 s
+RATE_LIMIT_PER_MINUTE = 60
+RATE_LIMIT_BURST = 10
+RATE_LIMIT_PER_SECOND = (RATE_LIMIT_PER_MINUTE - RATE_LIMIT_BURST) / 60
+# Nouvelles tentatives après un code 429 ou une erreur réseau : attente de RETRY_BACKOFF secondes,
+# doublée à chaque essai et plafonnée à DEFAULT_RETRY_AFTER, sauf si l'API précise Retry-After
+MAX_RETRIES = 5
+RETRY_BACKOFF = 2
+DEFAULT_RETRY_AFTER = 60
+
+class TokenBucket:
+    """
+    Limiteur de débit à seau de jetons, partagé entre les threads de récupération.
+    La réserve se remplit de `rate` jetons par seconde, jusqu'à `burst` jetons.
+    """
+
+    def __init__(self, rate, burst):
+        """
+        :param rate float: Nombre de jetons ajoutés par seconde
+        :param burst int: Nombre maximum de jetons en réserve
+        """
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Prend un jeton, en attendant qu'il y en ait un de disponible si la réserve est vide.
+
+        :returns None
+        """
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+                self.last = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+_RATE_LIMITER = TokenBucket(RATE_LIMIT_PER_SECOND, RATE_LIMIT_BURST)
+
+# Cache disque des réponses de l'API, pour relancer le script sans refaire les requêtes.
+# Désactivé par défaut : le script sert à récupérer des données fraîches.
+# OPENAQ_CACHE : 'disabled', 'enabled' (réponses de moins de CACHE_EXPIRE secondes) ou 'replay'
+# (cache uniquement, aucune requête réseau : une requête absente du cache est une erreur)
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '.cache', 'openaq')
+CACHE_EXPIRE = 3600
+CACHE_POLICY = os.getenv('OPENAQ_CACHE', 'disabled')
+
+# Nombre de mesures converties et écrites à la fois par save_data
+SAVE_CHUNK_SIZE = 10000
+
+def _retry_delay(response, attempt):
+    """
+    Donne le délai d'attente avant de renvoyer une requête refusée par un code 429.
+
+    :param response requests.Response: Réponse de l'API
+    :param attempt int: Numéro de la tentative (à partir de 0)
+    :returns float: Délai en secondes, issu de l'en-tête Retry-After ou, à défaut,
+                    d'une attente exponentielle plafonnée à DEFAULT_RETRY_AFTER
+    """
+    try:
+        return max(0.0, float(response.headers['Retry-After']))
+    except (KeyError, ValueError):
+        return min(DEFAULT_RETRY_AFTER, RETRY_BACKOFF * 2 ** attempt)
+
+def _request_with_retry(url, params=None, max_retries=MAX_RETRIES):
+    """
+    Envoie une requête GET en respectant la limite de débit, et la renvoie après une attente
+    croissante en cas de code 429 ou d'erreur réseau, au plus max_retries fois.
+
+    :param url str: URL de l'endpoint
+    :param params dict: Paramètres de la requête
+    :param max_retries int: Nombre maximum de nouvelles tentatives
+    :returns requests.Response: Dernière réponse reçue (éventuellement encore un code 429)
+    """
+    for attempt in range(max_retries + 1):
+        _RATE_LIMITER.acquire()
+        try:
+            response = _SESSION.get(url, params=params)
+        except requests.RequestException:
+            if attempt == max_retries:
+                raise
+            time.sleep(min(DEFAULT_RETRY_AFTER, RETRY_BACKOFF * 2 ** attempt))
+            continue
+        
+        if response.status_code != 429 or attempt == max_retries:
+            return response
+        
+        delay = _retry_delay(response, attempt)
+        print(f"Rate limit atteint, attente de {delay:g} secondes...")
+        time.sleep(delay)
+
+def _cache_path(url, params):
+    """
+    Construit le chemin du fichier de cache d'une requête, à partir d'un hash de l'URL et des paramètres.
+
+    :param url str: URL de l'endpoint
+    :param params dict: Paramètres de la requête
+    :returns str: Chemin du fichier JSON de cache
+    """
+    key = hashlib.sha256(f"{url}|{json.dumps(params, sort_keys=True)}".encode('utf-8')).hexdigest()
+    return os.path.join(CACHE_DIR, f"{key}.json")
+
+def _read_cache(url, params):
+    """
+    Relit la réponse en cache d'une requête selon CACHE_POLICY.
+
+    :param url str: URL de l'endpoint
+    :param params dict: Paramètres de la requête
+    :returns dict: Réponse JSON en cache, ou None s'il faut interroger l'API
+    :raises FileNotFoundError: Requête absente du cache en mode 'replay', pour ne pas produire
+                               en silence un jeu de données tronqué
+    """
+    if CACHE_POLICY == 'disabled':
+        return None
+    path = _cache_path(url, params)
+    try:
+        if CACHE_POLICY == 'replay' or time.time() - os.path.getmtime(path) < CACHE_EXPIRE:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+    except (OSError, ValueError):
+        pass
+    if CACHE_POLICY == 'replay':
+        raise FileNotFoundError(f"Absent du cache (mode replay) : {url} {params}")
+    return None
+
+def _write_cache(url, params, data):
+    """
+    Enregistre la réponse JSON d'une requête dans le cache disque.
+
+    :param url str: URL de l'endpoint
+    :param params dict: Paramètres de la requête
+    :param data dict: Réponse JSON de l'API
+    :returns None
+    """
+    if CACHE_POLICY == 'disabled':
+        return
+    path = _cache_path(url, params)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    # Écriture dans un fichier temporaire puis renommage : un autre thread ne lit jamais un fichier partiel
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
 def get_parameter_id(parameter):
     """
     Convertit le nom d'un polluant en ID numérique utilisé par l'API OpenAQ v3.
@@ -24,16 +215,7 @@ def get_parameter_id(parameter):
     :param parameter str: Nom du polluant (ex. 'pm25', 'no2', 'o3')
     :returns int: ID du paramètre correspondant, ou 2 (pm25) par défaut si non reconnu
     """
-    mapping = {
-        'pm25': 2,
-        'pm2.5': 2,
-        'pm10': 1,
-        'no2': 3,
-        'so2': 5,
-        'o3': 4,
-        'co': 6
-    }
-    return mapping.get(parameter.lower(), 2)
+    return PARAMETER_IDS.get(parameter.lower(), 2)
 
 def get_all_countries():
     """
@@ -41,13 +223,17 @@ def get_all_countries():
 
     :returns list: Liste de dictionnaires représentant chaque pays, ou une liste vide en cas d'erreur
     """
-    url = f"{BASE_URL}/countries"
-    headers = {'X-API-Key': API_KEY}
+    url = COUNTRIES_URL
+    
+    cached = _read_cache(url, {})
+    if cached is not None:
+        return cached.get('results', [])
     
     try:
-        response = requests.get(url, headers=headers)
+        response = _request_with_retry(url)
         if response.status_code == 200:
             data = response.json()
+            _write_cache(url, {}, data)
             return data.get('results', [])
         else:
             print(f"Erreur lors de la récupération des pays: {response.status_code}")
@@ -66,9 +252,7 @@ def get_locations(limit=1000, country=None, page=1):
     :returns tuple: Un tuple (results, meta) où results est la liste des locations
                     et meta un dictionnaire de métadonnées de pagination
     """
-    url = f"{BASE_URL}/locations"
-    
-    headers = {'X-API-Key': API_KEY}
+    url = LOCATIONS_URL
     
     params = {
         'limit': limit,
@@ -78,16 +262,17 @@ def get_locations(limit=1000, country=None, page=1):
     if country:
         params['countries_id'] = country.upper()
     
+    cached = _read_cache(url, params)
+    if cached is not None:
+        return cached.get('results', []), cached.get('meta', {})
+    
     try:
-        response = requests.get(url, params=params, headers=headers)
+        response = _request_with_retry(url, params=params)
         
         if response.status_code == 200:
             data = response.json()
+            _write_cache(url, params, data)
             return data.get('results', []), data.get('meta', {})
-        elif response.status_code == 429:
-            print("Rate limit atteint, attente de 60 secondes...")
-            time.sleep(60)
-            return get_locations(limit, country, page)
         else:
             print(f"Erreur API: {response.status_code}")
             print(f"Message: {response.text}")
@@ -96,36 +281,37 @@ def get_locations(limit=1000, country=None, page=1):
         print(f"Erreur de connexion: {e}")
         return [], {}
 
-def get_latest_by_parameter(parameter='pm25', limit=1000, page=1):
+def get_latest_by_parameter(parameter='pm25', limit=1000, page=1, parameter_id=None):
     """
     Récupère les dernières mesures disponibles pour un polluant donné.
 
     :param parameter str: Nom du polluant ('pm25', 'pm10', 'no2', 'so2', 'o3', 'co')
     :param limit int: Nombre maximum de résultats par page (max 1000)
     :param page int: Numéro de page pour la pagination
+    :param parameter_id int: ID du polluant s'il est déjà connu, pour éviter de le recalculer à chaque page
     :returns tuple: Un tuple (results, meta) où results est la liste des mesures
                     et meta un dictionnaire de métadonnées de pagination
     """
-    parameter_id = get_parameter_id(parameter)
-    url = f"{BASE_URL}/parameters/{parameter_id}/latest"
-    
-    headers = {'X-API-Key': API_KEY}
+    if parameter_id is None:
+        parameter_id = get_parameter_id(parameter)
+    url = LATEST_URLS[parameter_id]
     
     params = {
         'limit': limit,
         'page': page
     }
     
+    cached = _read_cache(url, params)
+    if cached is not None:
+        return cached.get('results', []), cached.get('meta', {})
+    
     try:
-        response = requests.get(url, params=params, headers=headers)
+        response = _request_with_retry(url, params=params)
         
         if response.status_code == 200:
             data = response.json()
+            _write_cache(url, params, data)
             return data.get('results', []), data.get('meta', {})
-        elif response.status_code == 429:
-            print("Rate limit atteint, attente de 60 secondes...")
-            time.sleep(60)
-            return get_latest_by_parameter(parameter, limit, page)
         else:
             print(f"Erreur API: {response.status_code}")
             print(f"Message: {response.text}")
@@ -134,6 +320,12 @@ def get_latest_by_parameter(parameter='pm25', limit=1000, page=1):
         print(f"Erreur de connexion: {e}")
         return [], {}
 
+# Champs extraits de chaque mesure, dans l'ordre du tuple retourné par _extract_fields
+FIELDS = (
+    'country_code', 'country_name', 'city', 'location_name', 'lat', 'lon',
+    'parameter_name', 'parameter_units', 'source_name', 'value', 'last_updated'
+)
+
 def _extract_fields(m):
     """
     Extrait les champs communs d'un dictionnaire de mesure brut retourné par l'endpoint /latest.
@@ -141,8 +333,7 @@ def _extract_fields(m):
     dans cet ordre de priorité.
 
     :param m dict: Dictionnaire brut d'une mesure telle que retournée par l'API
-    :returns dict: Dictionnaire avec les clés country_code, country_name, city, location_name,
-                   lat, lon, parameter_name, parameter_units, source_name, value, last_updated
+    :returns tuple: Valeurs des champs, dans l'ordre de FIELDS
     """
     coords = m.get('coordinates', {}) or {}
     lat = coords.get('latitude')
@@ -188,26 +379,101 @@ def _extract_fields(m):
     dt = m.get('datetime')
     last_updated = dt.get('utc') if isinstance(dt, dict) else dt
 
-    return {
-        'country_code': country_code,
-        'country_name': country_name,
-        'city': city,
-        'location_name': location_name,
-        'lat': lat,
-        'lon': lon,
-        'parameter_name': parameter_name,
-        'parameter_units': parameter_units,
-        'source_name': source_name,
-        'value': m.get('value'),
-        'last_updated': last_updated,
-    }
+    return (country_code, country_name, city, location_name, lat, lon,
+            parameter_name, parameter_units, source_name, m.get('value'), last_updated)
+
+def _last_page(meta, max_pages, limit=1000):
+    """
+    Calcule, dès la première page, le numéro de la dernière page à demander d'après meta.found,
+    pour ne jamais envoyer de requête au-delà des résultats disponibles.
+
+    :param meta dict: Métadonnées de pagination de la première page
+    :param max_pages int: Nombre maximum de pages à parcourir
+    :param limit int: Nombre de résultats par page
+    :returns int: Numéro de la dernière page, ou max_pages si found n'est pas un nombre (ex. '>1000')
+    """
+    found = meta.get('found', 0)
+    if isinstance(found, int):
+        return min(max_pages, -(-found // limit))
+    return max_pages
+
+def fetch_country_locations(country, max_pages=5):
+    """
+    Récupère toutes les pages de locations d'un pays.
+
+    :param country str: Code pays ISO 2 lettres (ex. 'FR', 'US')
+    :param max_pages int: Nombre maximum de pages à parcourir
+    :returns list: Liste des locations du pays
+    """
+    locations = []
+    
+    page = 1
+    last_page = max_pages
+    while page <= last_page:
+        locs, meta = get_locations(limit=1000, country=country, page=page)
+        if not locs:
+            break
+        if page == 1:
+            last_page = _last_page(meta, max_pages)
+        locations.extend(locs)
+        print(f"  {country} page {page}: {len(locs)} locations (Total: {len(locations)})")
+        
+        if len(locs) < 1000:
+            break
+        page += 1
+    
+    return locations
+
+def fetch_parameter(parameter, max_pages, location_ids=None):
+    """
+    Récupère toutes les pages des dernières mesures d'un polluant.
+
+    :param parameter str: Nom du polluant ('pm25', 'pm10', 'no2', 'so2', 'o3', 'co')
+    :param max_pages int: Nombre maximum de pages à parcourir
+    :param location_ids set: Identifiants des locations à garder, ou None pour tout garder
+    :returns list: Liste de dictionnaires bruts de mesures du polluant
+    """
+    measurements = []
+    parameter_id = get_parameter_id(parameter)
+    
+    page = 1
+    last_page = max_pages
+    while page <= last_page:
+        results, meta = get_latest_by_parameter(
+            parameter=parameter,
+            limit=1000,
+            page=page,
+            parameter_id=parameter_id
+        )
+        
+        if not results:
+            break
+        if page == 1:
+            last_page = _last_page(meta, max_pages)
+        # Une page incomplète est la dernière : le test porte sur la réponse brute, avant le filtre
+        # par location qui peut réduire n'importe quelle page à moins de 1000 mesures
+        page_complete = len(results) == 1000
+        
+        if location_ids is not None:
+            results = [r for r in results if r.get('locationsId') in location_ids]
+        
+        measurements.extend(results)
+        print(f"  {parameter.upper()} page {page}: {len(results)} mesures récupérées (Total: {len(measurements)})")
+        
+        if not page_complete:
+            break
+        
+        page += 1
+    
+    return measurements
 
 def fetch_all_data(parameters=['pm25', 'pm10', 'no2', 'so2', 'o3', 'co'], 
                    countries=None, max_pages=3):
     """
     Récupère toutes les dernières mesures pour plusieurs polluants, toutes pages confondues.
     Si une liste de pays est fournie, les locations sont d'abord récupérées pour filtrer
-    les mesures en conséquence.
+    les mesures en conséquence. Les polluants sont récupérés en parallèle, mais les mesures
+    sont assemblées dans l'ordre de la liste parameters.
 
     :param parameters list: Liste des noms de polluants à récupérer
     :param countries list: Liste des codes pays ISO 2 lettres pour filtrer, ou None pour tous les pays
@@ -217,56 +483,21 @@ def fetch_all_data(parameters=['pm25', 'pm10', 'no2', 'so2', 'o3', 'co'],
     all_measurements = []
     all_locations = []
     
-    total = len(parameters)
-    current = 0
-    
     if countries:
-        for country in countries:
-            print(f"  - {country}...")
-            page = 1
-            while page <= 5:
-                locs, meta = get_locations(limit=1000, country=country, page=page)
-                if not locs:
-                    break
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            # Pays récupérés en parallèle, locations assemblées dans l'ordre de la liste countries
+            for locs in executor.map(fetch_country_locations, countries):
                 all_locations.extend(locs)
-                print(f"    Page {page}: {len(locs)} locations (Total: {len(all_locations)})")
-                
-                found = meta.get('found', 0)
-                if len(locs) < 1000 or page * 1000 >= found:
-                    break
-                page += 1
-                time.sleep(0.3)
         
         print(f"{len(all_locations)} locations trouvées")
     
-    for parameter in parameters:
-        current += 1
-        print(f"\n[{current}/{total}] Récupération des dernières mesures de {parameter.upper()}...")
-        
-        page = 1
-        while page <= max_pages:
-            results, meta = get_latest_by_parameter(
-                parameter=parameter,
-                limit=1000,
-                page=page
-            )
-            
-            if not results:
-                break
-            
-            if countries and all_locations:
-                location_ids = {loc['id'] for loc in all_locations}
-                results = [r for r in results if r.get('locationsId') in location_ids]
-            
+    print(f"\nRécupération des dernières mesures de {len(parameters)} polluants...")
+    # Ensemble construit une seule fois : les locations ne changent plus pendant la récupération
+    location_ids = {loc['id'] for loc in all_locations} if countries and all_locations else None
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        # map conserve l'ordre des polluants, quel que soit l'ordre de fin des threads
+        for results in executor.map(lambda p: fetch_parameter(p, max_pages, location_ids), parameters):
             all_measurements.extend(results)
-            print(f"  Page {page}: {len(results)} mesures récupérées (Total: {len(all_measurements)})")
-            
-            found = meta.get('found', 0)
-            if len(results) < 1000 or page * 1000 >= found:
-                break
-            
-            page += 1
-            time.sleep(0.5)
     
     if all_locations:
         locations_dict = {loc['id']: loc for loc in all_locations}
@@ -281,39 +512,104 @@ def fetch_all_data(parameters=['pm25', 'pm10', 'no2', 'so2', 'o3', 'co'],
     
     return all_measurements
 
-def convert_to_dataframe(measurements):
+def _has_coordinates(m):
     """
-    Convertit une liste de dictionnaires de mesures bruts en un DataFrame pandas
-    structuré et lisible.
+    Indique si une mesure brute a une latitude et une longitude renseignées.
+
+    :param m dict: Dictionnaire brut d'une mesure telle que retournée par l'API
+    :returns bool: True si les deux coordonnées sont présentes
+    """
+    coords = m.get('coordinates') if isinstance(m, dict) else None
+    return isinstance(coords, dict) and coords.get('latitude') is not None and coords.get('longitude') is not None
+
+def extract_columns(measurements):
+    """
+    Extrait une seule fois les champs de chaque mesure, rangés par colonne (une liste par champ),
+    pour alimenter à la fois le CSV et le GeoJSON.
 
     :param measurements list: Liste de dictionnaires de mesures tels que retournés par fetch_all_data
-    :returns DataFrame: DataFrame pandas avec les colonnes Country Code, City, Location,
-                        Coordinates, Pollutant, Source Name, Unit, Value, Last Updated, Country Label
+    :returns dict: Dictionnaire associant à chaque nom de FIELDS la liste de ses valeurs
     """
-    records = []
+    rows = []
     
     for m in measurements:
         try:
-            f = _extract_fields(m)
-
-            record = {
-                'Country Code': f['country_code'],
-                'City': f['city'],
-                'Location': f['location_name'],
-                'Coordinates': f"{f['lat']}, {f['lon']}" if f['lat'] is not None and f['lon'] is not None else None,
-                'Pollutant': f['parameter_name'],
-                'Source Name': f['source_name'],
-                'Unit': f['parameter_units'],
-                'Value': f['value'],
-                'Last Updated': f['last_updated'],
-                'Country Label': f['country_name'],
-            }
-            records.append(record)
+            rows.append(_extract_fields(m))
         except Exception as e:
             print(f"Erreur lors du traitement d'une mesure: {e}")
             continue
     
-    return pd.DataFrame(records)
+    # Transposition des tuples en colonnes, faite en C par zip
+    columns = zip(*rows) if rows else [()] * len(FIELDS)
+    return {name: list(values) for name, values in zip(FIELDS, columns)}
+
+def columns_to_dataframe(columns):
+    """
+    Construit le DataFrame des mesures à partir des colonnes déjà extraites.
+
+    :param columns dict: Colonnes retournées par extract_columns
+    :returns DataFrame: DataFrame pandas avec les colonnes Country Code, City, Location,
+                        Coordinates, Pollutant, Source Name, Unit, Value, Last Updated, Country Label
+    """
+    coordinates = [
+        f"{lat}, {lon}" if lat is not None and lon is not None else None
+        for lat, lon in zip(columns['lat'], columns['lon'])
+    ]
+    
+    return pd.DataFrame({
+        'Country Code': columns['country_code'],
+        'City': columns['city'],
+        'Location': columns['location_name'],
+        'Coordinates': coordinates,
+        'Pollutant': columns['parameter_name'],
+        'Source Name': columns['source_name'],
+        'Unit': columns['parameter_units'],
+        'Value': columns['value'],
+        'Last Updated': columns['last_updated'],
+        'Country Label': columns['country_name'],
+    })
+
+def convert_to_dataframe(measurements):
+    """
+    Convertit une liste de dictionnaires de mesures bruts en un DataFrame pandas
+    structuré et lisible.
+
+    :param measurements list: Liste de dictionnaires de mesures tels que retournés par fetch_all_data
+    :returns DataFrame: DataFrame pandas avec les colonnes Country Code, City, Location,
+                        Coordinates, Pollutant, Source Name, Unit, Value, Last Updated, Country Label
+    """
+    return columns_to_dataframe(extract_columns(measurements))
+
+def iter_features(columns):
+    """
+    Génère une à une les features GeoJSON des mesures géolocalisées, sans construire de liste.
+
+    :param columns dict: Colonnes retournées par extract_columns
+    :returns generator: Générateur de dictionnaires Feature (points géolocalisés)
+    """
+    for (country_code, country_name, city, location_name, lat, lon,
+         parameter_name, parameter_units, source_name, value, last_updated) in zip(*(columns[name] for name in FIELDS)):
+        if lat is None or lon is None:
+            continue
+        
+        yield {
+            "type": "Feature",
+            "geometry": {
+                "type": "Point",
+                "coordinates": [lon, lat]
+            },
+            "properties": {
+                "country": country_code,
+                "city": city,
+                "location": location_name,
+                "measurements_parameter": parameter_name,
+                "measurements_sourcename": source_name,
+                "measurements_unit": parameter_units,
+                "measurements_value": value,
+                "measurements_lastupdated": last_updated,
+                "country_name_en": country_name,
+            }
+        }
 
 def convert_to_geojson(measurements):
     """
@@ -322,46 +618,20 @@ def convert_to_geojson(measurements):
     :param measurements list: Liste de dictionnaires de mesures tels que retournés par fetch_all_data
     :returns dict: Dictionnaire GeoJSON valide contenant une FeatureCollection de points géolocalisés
     """
-    features = []
-    
-    for m in measurements:
-        try:
-            f = _extract_fields(m)
-
-            if f['lat'] is None or f['lon'] is None:
-                continue
-            
-            feature = {
-                "type": "Feature",
-                "geometry": {
-                    "type": "Point",
-                    "coordinates": [f['lon'], f['lat']]
-                },
-                "properties": {
-                    "country": f['country_code'],
-                    "city": f['city'],
-                    "location": f['location_name'],
-                    "measurements_parameter": f['parameter_name'],
-                    "measurements_sourcename": f['source_name'],
-                    "measurements_unit": f['parameter_units'],
-                    "measurements_value": f['value'],
-                    "measurements_lastupdated": f['last_updated'],
-                    "country_name_en": f['country_name'],
-                }
-            }
-            features.append(feature)
-        except Exception as e:
-            print(f"Erreur lors de la création d'une feature : {e}")
-            continue
+    # Seules les mesures géolocalisées donnent une feature : les autres sont écartées
+    # avant l'extraction complète de leurs champs
+    geolocated = [m for m in measurements if _has_coordinates(m)]
     
     return {
         "type": "FeatureCollection",
-        "features": features
+        "features": list(iter_features(extract_columns(geolocated)))
     }
 
 def save_data(measurements, output_dir='../../data/raw'):
     """
     Sauvegarde les mesures en CSV et GeoJSON.
+    Les mesures sont converties et écrites par blocs de SAVE_CHUNK_SIZE : seules les colonnes
+    et le DataFrame du bloc en cours sont gardés en mémoire, en plus des mesures brutes.
 
     :param measurements list: Liste de dictionnaires de mesures
     :param output_dir str: Chemin du répertoire de sortie (créé s'il n'existe pas)
@@ -369,16 +639,39 @@ def save_data(measurements, output_dir='../../data/raw'):
     """
     os.makedirs(output_dir, exist_ok=True)
     
-    df = convert_to_dataframe(measurements)
     csv_path = os.path.join(output_dir, 'rawdata.csv')
-    df.to_csv(csv_path, index=False, sep=';', encoding='utf-8')
-    print(f"CSV sauvegardé: {csv_path} ({len(df)} lignes)")
-    
-    geojson = convert_to_geojson(measurements)
     geojson_path = os.path.join(output_dir, 'rawdata.geojson')
-    with open(geojson_path, 'w', encoding='utf-8') as f:
-        json.dump(geojson, f, ensure_ascii=False, separators=(',', ':'))
-    print(f"GeoJSON sauvegardé: {geojson_path} ({len(geojson['features'])} features)")
+    nb_lignes = 0
+    nb_features = 0
+    
+    # Type de la colonne Value déduit une seule fois sur toutes les mesures, comme pour un DataFrame unique :
+    # déduit bloc par bloc, un bloc ne contenant que des entiers écrirait 13 là où les autres écrivent 13.0
+    value_dtype = pd.Series([m.get('value') for m in measurements if isinstance(m, dict)]).dtype
+    
+    with open(csv_path, 'w', encoding='utf-8', newline='') as csv_file, open(geojson_path, 'w', encoding='utf-8') as geojson_file:
+        geojson_file.write('{"type":"FeatureCollection","features":[')
+        
+        # Au moins un bloc, pour écrire l'en-tête du CSV même sans mesure
+        for start in range(0, max(len(measurements), 1), SAVE_CHUNK_SIZE):
+            # Extraction commune aux deux formats
+            columns = extract_columns(measurements[start:start + SAVE_CHUNK_SIZE])
+            
+            df = columns_to_dataframe(columns)
+            df['Value'] = df['Value'].astype(value_dtype)
+            # Un seul écrivain (pandas) et un seul type de valeur pour tout le fichier
+            df.to_csv(csv_file, index=False, sep=';', header=start == 0)
+            nb_lignes += len(df)
+            
+            for feature in iter_features(columns):
+                if nb_features:
+                    geojson_file.write(',')
+                geojson_file.write(json.dumps(feature, ensure_ascii=False, separators=(',', ':')))
+                nb_features += 1
+        
+        geojson_file.write(']}')
+    
+    print(f"CSV sauvegardé: {csv_path} ({nb_lignes} lignes)")
+    print(f"GeoJSON sauvegardé: {geojson_path} ({nb_features} features)")
 
 if __name__ == "__main__":
     
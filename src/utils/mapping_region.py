@@ -1,3 +1,6 @@
+import numpy as np
+import pandas as pd
+
 # Mapping des codes pays ISO-2 vers les régions géographiques pour notre histogramme analysant l'espérance de vie et de la pollution
 
 
@@ -207,17 +210,31 @@ REGION_MAPPING = {
     'KI': 'Océanie',
 }
 
+# Régions connues plus 'Autre', en catégorie triée : une colonne de régions tient sur des codes int8
+REGION_CATEGORIES = pd.CategoricalDtype(sorted(set(REGION_MAPPING.values()) | {'Autre'}))
+
 def get_region(country_code):
     """
     Retourne la région pour un code pays donné
     
     :param country_code: code pays ISO-2 (ex: 'FR', 'US')
     :returns str : Nom de la région ou 'Autre' si non trouvé
-    return REGION_MAPPING.get(country_code, 'Autre')
     """
 
     return REGION_MAPPING.get(country_code, 'Autre')
-        
+
+
+def get_regions(country_codes):
+    """
+    Version vectorisée de get_region : associe sa région à toute une colonne de codes pays en un seul
+    Series.map plutôt qu'un appel Python par ligne
+    
+    :param country_codes: Codes pays ISO-2 (Series, tableau NumPy ou liste)
+    :returns pandas.Series: Régions en catégorie REGION_CATEGORIES ('Autre' si non trouvé), même index que l'entrée
+    """
+
+    return pd.Series(country_codes).map(REGION_MAPPING).astype(REGION_CATEGORIES).fillna('Autre')
+
 
 def calculate_years_lost(pm25_concentration, seuil=5):
     """
@@ -235,4 +252,23 @@ def calculate_years_lost(pm25_concentration, seuil=5):
     exces = pm25_concentration - seuil
     annee_perdue = exces * 0.098
     
-    return round(annee_perdue, 2)
\ No newline at end of file
+    return round(annee_perdue, 2)
+
+
+def calculate_years_lost_vec(pm25_concentrations, seuil=5):
+    """
+    Version vectorisée de calculate_years_lost, appliquée en une passe NumPy à toutes les mesures.
+    L'arrondi au centième est celui de np.round : sur les rares valeurs à mi-chemin de deux centièmes,
+    il peut différer d'un centième de celui de round().
+    
+    :param pm25_concentrations: Concentrations de PM2.5 en µg/m³ (Series ou tableau NumPy)
+    :param seuil: Seuil OMS (par défaut 5 µg/m³)
+    
+    :returns numpy.ndarray: Nombre d'années perdues de chaque mesure (0 si en-dessous du seuil)
+    """
+
+    pm25_concentrations = np.asarray(pm25_concentrations, dtype=np.float64)
+    # Excès ramené à 0 sous le seuil : les années perdues y valent 0 sans masque ni np.where
+    annees_perdues = np.maximum(pm25_concentrations - seuil, 0) * 0.098
+    
+    return np.round(annees_perdues, 2)